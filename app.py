@@ -3,12 +3,15 @@ Flask Web Application for Fake News Detector
 Provides REST API endpoints for the frontend to use
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 from flask_cors import CORS
 import sys
 import os
 import traceback
 import logging
+import time
+import json
+import uuid
 
 # Enable detailed logging
 logging.basicConfig(level=logging.DEBUG)
@@ -17,8 +20,14 @@ logger = logging.getLogger(__name__)
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from predict import predict, explain_prediction
+from predict import predict, explain_prediction, model_version
 from check_url import fetch_article
+from deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+import verdict_cache
+import near_duplicates
+import admission
+import profiling
+from model_manager import MANAGER as MODEL_MANAGER
 
 app = Flask(__name__)
 CORS(app)
@@ -26,6 +35,172 @@ CORS(app)
 # Configure upload folder
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 
+# Exact-match cache of full /api/predict and /api/url responses (see src/verdict_cache.py)
+VERDICT_CACHE = verdict_cache.from_env()
+
+# Fields echoing the request; not cached (the text can be 200K characters) and filled in from the
+# current request on a hit, since the key matches whitespace and URL variants of earlier requests
+REQUEST_ECHO_FIELDS = ('text', 'url')
+
+def cached_response(key, overrides):
+    """Return a cached JSON response for key (with overrides applied), or None on a miss."""
+    payload = VERDICT_CACHE.get(key)
+    if payload is None:
+        return None
+    payload = dict(payload)
+    payload.update(overrides)
+    resp = jsonify(payload)
+    resp.headers['X-Cache'] = 'HIT'
+    return resp, 200
+
+def cache_response(key, payload):
+    # degraded answers (e.g. fact-check skipped under load) are not worth keeping
+    if not payload.get('degraded'):
+        VERDICT_CACHE.set(key, {k: v for k, v in payload.items() if k not in REQUEST_ECHO_FIELDS})
+    resp = jsonify(payload)
+    resp.headers['X-Cache'] = 'MISS'
+    return resp, 200
+
+# MinHash index of previously checked articles, reused for lightly edited republications
+NEAR_DUPLICATES = near_duplicates.from_env()
+# What an entry's ref is, per endpoint: the article URL, or the SHA-256 of the normalized submitted text
+NEAR_DUPLICATE_REF_FIELDS = {'predict': 'text_sha256', 'url': 'url'}
+
+def find_near_duplicate(endpoint, text, version, overrides):
+    """Earlier response of endpoint for a near-duplicate of text (with overrides applied), or None."""
+    try:
+        # responses differ between endpoints, so each endpoint only matches its own entries
+        match = NEAR_DUPLICATES.find(text, f'{endpoint}:{version}')
+    except Exception as e:
+        logger.warning(f"Near-duplicate lookup failed: {e}")
+        return None
+    if match is None:
+        return None
+    response = dict(match['payload'])
+    response.update(overrides)
+    response['near_duplicate_of'] = {NEAR_DUPLICATE_REF_FIELDS[endpoint]: match['ref'],
+                                     'similarity': round(match['similarity'], 3)}
+    return response
+
+def index_near_duplicate(endpoint, text, ref, response, version):
+    if response.get('degraded'):
+        return
+    try:
+        payload = {k: v for k, v in response.items() if k not in REQUEST_ECHO_FIELDS}
+        NEAR_DUPLICATES.add(text, ref, payload, f'{endpoint}:{version}')
+    except Exception as e:
+        logger.warning(f"Near-duplicate indexing failed: {e}")
+
+# Opt-in per-request profiling (X-Profile header or PROFILE_SAMPLE_RATE, see src/profiling.py)
+PROFILED_ENDPOINTS = {'api_predict', 'api_url', 'api_explain'}
+
+@app.before_request
+def start_profiling():
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return None
+    mode = profiling.choose_mode(request.headers.get('X-Profile'))
+    if mode is not None:
+        session = profiling.start(mode)
+        if session is not None:
+            g.profile = (session, request.headers.get('X-Request-ID') or uuid.uuid4().hex)
+    return None
+
+@app.after_request
+def attach_profile(response):
+    """Write the request's profile and add the hot-function summary as a 'debug' field.
+
+    Profiling is a passive debug aid: a failure here is logged and never changes the response.
+    """
+    profiled = g.pop('profile', None)
+    if profiled is None:
+        return response
+    session, request_id = profiled
+    try:
+        summary = profiling.finish(session, request_id)
+        logger.info(f"Profiled {request.path} as {request_id}: {summary.get('profile_file', 'not written')}")
+        data = response.get_json(silent=True) if response.is_json else None
+        if isinstance(data, dict):
+            data['debug'] = {'profile': summary}
+            response.set_data(json.dumps(data))
+        response.headers['X-Request-ID'] = request_id
+    except Exception as e:
+        logger.warning(f"Profiling {request.path} failed: {e}")
+    return response
+
+@app.teardown_request
+def abandon_profile(exc=None):
+    # after_request is skipped when a view raises; still stop the profiler
+    profiled = g.pop('profile', None)
+    if profiled is not None:
+        try:
+            profiling.finish(*profiled)
+        except Exception as e:
+            logger.warning(f"Stopping the profiler failed: {e}")
+
+# End-to-end time budget per API request (seconds). Clients may ask for a shorter one with the
+# X-Request-Budget-Ms header; fetch, model and fact-check stages each get what is left of it.
+REQUEST_BUDGET_SECONDS = float(os.environ.get('REQUEST_BUDGET_SECONDS', 30))
+
+def request_deadline():
+    return g.get('deadline', NO_DEADLINE)
+
+def deadline_degradation(result):
+    """Explain how a predict() result was cut short by the request deadline, or None."""
+    if result.get('chunking') and result['chunking'].get('deadline_hit'):
+        return 'Article partially scored: request time budget exhausted'
+    if result.get('deadline_exceeded'):
+        return 'Fact-check skipped or incomplete: request time budget exhausted'
+    return None
+
+# Bounded admission lanes: 'model' for model-only scoring, 'fetch' for article fetching / fact-check calls
+ADMISSION = admission.from_env()
+ENDPOINT_LANES = {'api_predict': 'model', 'api_explain': 'model', 'api_url': 'fetch'}
+
+@app.before_request
+def admit_request():
+    """Take a slot in the endpoint's lane, or reject with 429 when the lane is saturated."""
+    lane_name = ENDPOINT_LANES.get(request.endpoint)
+    if lane_name is None:
+        return None
+    budget = REQUEST_BUDGET_SECONDS
+    header = request.headers.get('X-Request-Budget-Ms')
+    if header:
+        try:
+            budget = min(budget, max(0.0, float(header) / 1000.0))
+        except ValueError:
+            return jsonify({'error': 'X-Request-Budget-Ms must be a number'}), 400
+    g.deadline = Deadline(budget)
+    lane = ADMISSION.lanes[lane_name]
+    # time spent waiting for a slot counts against the request budget
+    if not lane.acquire(timeout=min(lane.queue_timeout, g.deadline.remaining())):
+        resp = jsonify({'error': 'Server busy, please retry later.'})
+        resp.headers['Retry-After'] = str(lane.retry_after())
+        return resp, 429
+    g.admission = (lane, time.monotonic())
+    return None
+
+@app.teardown_request
+def release_admission(exc=None):
+    admitted = g.pop('admission', None)
+    if admitted is not None:
+        lane, start = admitted
+        lane.release(time.monotonic() - start)
+
+def predict_with_factcheck(text, deadline=NO_DEADLINE):
+    """predict(use_api=True) if a 'fetch' slot is free right now, else None (answer model-only)."""
+    lane = ADMISSION.lanes['fetch']
+    if not lane.acquire(timeout=0):
+        return None
+    start = time.monotonic()
+    try:
+        return predict(text, use_api=True, deadline=deadline)
+    finally:
+        lane.release(time.monotonic() - start)
+
+# Longest text accepted by /api/predict; texts over predict.LONG_DOC_CHARS are scored in chunks
+# with early exit, so CPU per request stays bounded regardless of length
+MAX_TEXT_CHARS = 200000
+
 # Special categories for known sites
 SATIRE_SITES = {
     'theonion.com': 'Intentional Satire 🎭',
@@ -86,38 +261,63 @@ def api_predict():
         if not text:
             return jsonify({'error': 'Empty text provided'}), 400
         
-        if len(text) > 5000:
-            return jsonify({'error': 'Text too long (max 5000 characters)'}), 400
+        if len(text) > MAX_TEXT_CHARS:
+            return jsonify({'error': f'Text too long (max {MAX_TEXT_CHARS} characters)'}), 400
+        
+        version = model_version()
+        VERDICT_CACHE.check_model_version(version)
+        cache_key = verdict_cache.text_key('predict', text, version)
+        hit = cached_response(cache_key, {'text': text})
+        if hit is not None:
+            return hit
+        
+        near_dup = find_near_duplicate('predict', text, version, {'text': text})
+        if near_dup is not None:
+            return cache_response(cache_key, near_dup)
+        
+        deadline = request_deadline()
         
         # PRIMARY: Get prediction from NLP model (without API)
-        result = predict(text, use_api=False)
+        result = predict(text, use_api=False, deadline=deadline)
         
         model_confidence = result['probabilities'][result['final_label']] * 100
         
         # SECONDARY: Only call API if model confidence is low (< 70%) OR to verify
+        # (skipped, answering model-only, when the fetch/API lane is saturated or time is up)
         api_matches = []
         api_used_for_verdict = False
+        degraded = deadline_degradation(result)
         
-        if model_confidence < 70:  # Model is uncertain, check API
-            api_result = predict(text, use_api=True)
-            if api_result['decision_source'] == 'api' and api_result['api_label'] is not None:
-                # API found a confident match, use it
-                result = api_result
-                api_used_for_verdict = True
-            if api_result['factcheck_api']:
-                matched_claims = api_result['factcheck_api'].get('matched_claims', [])
-                if matched_claims:
-                    for claim in matched_claims[:5]:
-                        api_matches.append({
-                            'text': claim.get('text', '')[:150],
-                            'verdict': claim.get('verdict', 'No verdict'),
-                            'url': claim.get('url', '')
-                        })
+        if deadline.expired():
+            degraded = degraded or 'Fact-check skipped: request time budget exhausted'
+        elif model_confidence < 70:  # Model is uncertain, check API
+            api_result = predict_with_factcheck(text, deadline)
+            if api_result is None:
+                degraded = 'Fact-check skipped: server busy'
+            else:
+                degraded = degraded or deadline_degradation(api_result)
+                if api_result['decision_source'] == 'api' and api_result['api_label'] is not None:
+                    # API found a confident match, use it
+                    result = api_result
+                    api_used_for_verdict = True
+                if api_result['factcheck_api']:
+                    matched_claims = api_result['factcheck_api'].get('matched_claims', [])
+                    if matched_claims:
+                        for claim in matched_claims[:5]:
+                            api_matches.append({
+                                'text': claim.get('text', '')[:150],
+                                'verdict': claim.get('verdict', 'No verdict'),
+                                'url': claim.get('url', '')
+                            })
         else:
             # Model is confident, still fetch API data for reference (non-blocking)
             try:
-                api_result = predict(text, use_api=True)
-                if api_result['factcheck_api']:
+                api_result = predict_with_factcheck(text, deadline)
+                if api_result is None:
+                    degraded = 'Fact-check skipped: server busy'
+                else:
+                    degraded = degraded or deadline_degradation(api_result)
+                if api_result is not None and api_result['factcheck_api']:
                     matched_claims = api_result['factcheck_api'].get('matched_claims', [])
                     if matched_claims:
                         for claim in matched_claims[:3]:  # Only top 3 for reference
@@ -146,8 +346,13 @@ def api_predict():
             'api_matches': api_matches,
             'api_count': len(api_matches),
         }
+        if result.get('chunking'):
+            response['chunking'] = result['chunking']
+        if degraded:
+            response['degraded'] = degraded
         
-        return jsonify(response), 200
+        index_near_duplicate('predict', text, verdict_cache.text_digest(text), response, version)
+        return cache_response(cache_key, response)
     
     except Exception as e:
         logger.error(f"Error in /api/predict: {str(e)}")
@@ -228,9 +433,20 @@ def api_url():
                 'verdict_type': verdict_type,
             }), 200
         
+        version = model_version()
+        VERDICT_CACHE.check_model_version(version)
+        cache_key = verdict_cache.url_key('url', url, version)
+        hit = cached_response(cache_key, {'url': url})
+        if hit is not None:
+            return hit
+        
         # Fetch article (returns tuple: title, text)
+        deadline = request_deadline()
         try:
-            title, article_text = fetch_article(url)
+            title, article_text = fetch_article(url, deadline=deadline)
+        except DeadlineExceeded as timeout_error:
+            logger.error(f"Fetching {url} exceeded the request budget: {timeout_error}")
+            return jsonify({'error': 'Timed out fetching the article within the request time budget. Try again or use the "Check Text" tab instead.'}), 504
         except Exception as fetch_error:
             logger.error(f"Error fetching article from {url}: {str(fetch_error)}")
             error_msg = str(fetch_error).lower()
@@ -257,18 +473,27 @@ def api_url():
         # Combine title and text for better analysis
         combined_text = (title + ' ' + article_text).strip() if title else article_text
         
+        near_dup = find_near_duplicate('url', combined_text, version,
+                                       {'url': url, 'article_length': len(combined_text)})
+        if near_dup is not None:
+            return cache_response(cache_key, near_dup)
+        
         # PRIMARY: Get prediction from NLP model (without API)
-        result = predict(combined_text, use_api=False)
+        result = predict(combined_text, use_api=False, deadline=deadline)
         
         model_confidence = result['probabilities'][result['final_label']] * 100
         
-        # SECONDARY: Only call API if model confidence is low (< 70%)
+        # SECONDARY: Only call API if model confidence is low (< 70%) and time is left
         api_matches = []
         api_used_for_verdict = False
+        degraded = deadline_degradation(result)
         
-        if model_confidence < 70:  # Model is uncertain, check API
+        if model_confidence < 70 and deadline.expired():
+            degraded = degraded or 'Fact-check skipped: request time budget exhausted'
+        elif model_confidence < 70:  # Model is uncertain, check API
             try:
-                api_result = predict(combined_text, use_api=True)
+                api_result = predict(combined_text, use_api=True, deadline=deadline)
+                degraded = degraded or deadline_degradation(api_result)
                 if api_result['decision_source'] == 'api' and api_result['api_label'] is not None:
                     result = api_result
                     api_used_for_verdict = True
@@ -298,8 +523,13 @@ def api_url():
             'api_matches': api_matches,
             'api_count': len(api_matches),
         }
+        if result.get('chunking'):
+            response['chunking'] = result['chunking']
+        if degraded:
+            response['degraded'] = degraded
         
-        return jsonify(response), 200
+        index_near_duplicate('url', combined_text, url, response, version)
+        return cache_response(cache_key, response)
     
     except Exception as e:
         logger.error(f"Error in /api/url: {str(e)}")
@@ -311,5 +541,16 @@ def health():
     """Health check endpoint"""
     return jsonify({'status': 'ok', 'message': 'Fake News Detector API is running'}), 200
 
+@app.route('/api/admission', methods=['GET'])
+def admission_stats():
+    """Queue depth, in-flight requests and rejection counts per admission lane (this worker process)"""
+    return jsonify({'pid': os.getpid(), 'lanes': ADMISSION.stats()}), 200
+
+@app.route('/api/models', methods=['GET'])
+def model_stats():
+    """Resident size, load/hit/eviction counts of the optional models (this worker process)"""
+    return jsonify({'pid': os.getpid(), **MODEL_MANAGER.stats()}), 200
+
 if __name__ == '__main__':
+    # Development server; for production use serve.py (pre-forked gunicorn workers sharing the model)
     app.run(debug=False, host='127.0.0.1', port=5000)
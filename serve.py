@@ -0,0 +1,98 @@
+"""
+Production entry point for the Fake News Detector API.
+
+Runs app.py under gunicorn with several worker processes. The model, WordNet index
+and NLTK tokenizers/taggers are loaded once in the master process before the workers
+are forked, so the workers share those memory pages copy-on-write instead of each
+loading their own copy.
+
+Workers are threaded (gthread). The default thread count is the admission lanes'
+combined concurrency plus a few spare (src/admission.py); with fewer threads than that
+the lanes never fill, so slow article fetches block model-only requests again.
+
+Usage:
+    python serve.py --workers 4 --bind 0.0.0.0:8000
+Worker count can also be set with the WEB_CONCURRENCY environment variable.
+Measure per-worker memory and startup time with src/measure_workers.py.
+"""
+
+import argparse
+import gc
+import logging
+import multiprocessing
+import os
+import sys
+import time
+
+from gunicorn.app.base import BaseApplication
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+import admission  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def default_workers():
+    env = os.environ.get('WEB_CONCURRENCY')
+    if env:
+        return int(env)
+    return multiprocessing.cpu_count()
+
+
+def load_app():
+    """Import the Flask app and warm up the model and NLTK data.
+
+    With preload_app this runs in the master before fork, otherwise once in every worker.
+    """
+    from app import app
+    from predict import warm_up
+    start = time.perf_counter()
+    warm_up()
+    # Move everything allocated so far out of the GC's tracked generations; otherwise the first
+    # collection in each worker touches (and un-shares) every object header.
+    gc.freeze()
+    logger.info('Loaded model and NLTK data in %.2fs (pid %d)', time.perf_counter() - start, os.getpid())
+    return app
+
+
+class FakeNewsServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return load_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the Fake News Detector API with pre-forked gunicorn workers')
+    parser.add_argument('--bind', default='127.0.0.1:5000')
+    parser.add_argument('--workers', type=int, default=default_workers(), help='Worker processes (default: WEB_CONCURRENCY or CPU count)')
+    parser.add_argument('--threads', type=int, default=admission.default_threads(),
+                        help='Threads per worker (default: admission lane concurrency + %d)' % admission.SPARE_THREADS)
+    parser.add_argument('--timeout', type=int, default=120, help='Worker timeout in seconds')
+    parser.add_argument('--no-preload', action='store_true', help='Load the model in each worker after fork (for comparison)')
+    args = parser.parse_args()
+    lane_threads = admission.default_threads() - admission.SPARE_THREADS
+    if args.threads <= lane_threads:
+        logger.warning('%d threads per worker do not exceed the admission lanes\' combined concurrency (%d): '
+                       'requests queue for worker threads instead of being admitted or rejected per lane',
+                       args.threads, lane_threads)
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread' if args.threads > 1 else 'sync',
+        'timeout': args.timeout,
+        'preload_app': not args.no_preload,
+    }
+    FakeNewsServer(options).run()
+
+
+if __name__ == '__main__':
+    main()
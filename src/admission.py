@@ -0,0 +1,124 @@
+"""
+Admission control for the web API.
+
+Requests are admitted into one of two lanes with separate limits:
+  - 'model': model-only work (/api/predict, /api/explain), cheap and CPU-bound
+  - 'fetch': work that waits on article hosts or the fact-check API (/api/url and the
+             fact-check stage of /api/predict)
+Each lane runs at most max_concurrent requests and lets at most max_queue more wait up to
+queue_timeout seconds for a slot. Anything beyond that is rejected immediately, so the app
+answers 429 with a Retry-After estimate instead of piling up requests until they time out.
+A slow fetch lane therefore never starves model-only scoring.
+
+Limits are per process (each gunicorn worker has its own lanes), so admission control only
+works with threaded workers: a sync worker runs one request at a time and never fills a
+lane. serve.py therefore runs gthread workers with default_threads() threads, more than the
+two lanes' combined concurrency. Settings (environment): ADMISSION_MODEL_CONCURRENCY,
+ADMISSION_MODEL_QUEUE, ADMISSION_FETCH_CONCURRENCY, ADMISSION_FETCH_QUEUE,
+ADMISSION_QUEUE_TIMEOUT.
+"""
+
+import math
+import os
+import threading
+import time
+
+
+class Lane:
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.avg_service_s = None  # exponentially weighted mean time a request holds a slot
+
+    def acquire(self, timeout=None):
+        """Take a slot, waiting up to timeout (default queue_timeout) if the lane is busy.
+
+        Returns False at once when the queue is full, or after the timeout.
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._cond:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_queue or timeout <= 0:
+                self.rejected_full += 1
+                return False
+            self.waiting += 1
+            deadline = time.monotonic() + timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.admitted += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self, service_s):
+        with self._cond:
+            self.active -= 1
+            self.avg_service_s = service_s if self.avg_service_s is None else 0.8 * self.avg_service_s + 0.2 * service_s
+            self._cond.notify()
+
+    def retry_after(self):
+        """Seconds until the current backlog has likely drained (at least 1)."""
+        with self._cond:
+            per_request = self.avg_service_s or 1.0
+            return max(1, math.ceil((self.waiting + 1) * per_request / self.max_concurrent))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active': self.active,
+                'queued': self.waiting,
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_full,
+                'rejected_queue_timeout': self.rejected_timeout,
+                'avg_service_ms': round(self.avg_service_s * 1000, 1) if self.avg_service_s is not None else None,
+            }
+
+
+class AdmissionController:
+    def __init__(self, lanes):
+        self.lanes = {lane.name: lane for lane in lanes}
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+# Threads per worker beyond the lanes' combined concurrency, so requests can reach a full lane
+# (and be queued or rejected) instead of waiting for a worker thread
+SPARE_THREADS = 4
+
+
+def _concurrency(lane):
+    defaults = {'model': 8, 'fetch': 4}
+    return int(os.environ.get(f'ADMISSION_{lane.upper()}_CONCURRENCY', defaults[lane]))
+
+
+def default_threads():
+    """Worker threads needed for the lanes to take effect."""
+    return _concurrency('model') + _concurrency('fetch') + SPARE_THREADS
+
+
+def from_env():
+    timeout = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 5))
+    return AdmissionController([
+        Lane('model', _concurrency('model'), int(os.environ.get('ADMISSION_MODEL_QUEUE', 32)), timeout),
+        Lane('fetch', _concurrency('fetch'), int(os.environ.get('ADMISSION_FETCH_QUEUE', 8)), timeout),
+    ])
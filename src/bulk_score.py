@@ -0,0 +1,246 @@
+"""
+Streaming offline bulk scoring (used by `python src/predict.py --bulk INPUT ...`).
+
+Records are streamed from a JSONL or CSV file (or stdin), scored in batches across a
+process pool and written incrementally to JSONL or to a directory of Parquet part files
+(Parquet needs pyarrow). Only a bounded number of batches is in flight, so memory stays
+constant regardless of input size.
+
+After every written batch a checkpoint (<output>.checkpoint.json) records how many input
+records are done and how far the output got; --resume continues from there after an
+interruption, discarding any output written after the last checkpoint.
+"""
+
+import csv
+import itertools
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import predict
+
+LABEL_NAMES = {0: 'fake', 1: 'true'}
+
+
+def read_records(path, fmt):
+    """Yield input records as dicts; unparseable lines become {'_error': ...} so positions stay stable."""
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8', newline='')
+    try:
+        if fmt == 'csv':
+            csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))  # article bodies exceed the 128KB default
+            for row in csv.DictReader(stream):
+                yield row
+        else:
+            for line in stream:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield {'_error': f'invalid JSON: {e}'}
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def batched(iterable, n):
+    it = iter(iterable)
+    while True:
+        batch = list(itertools.islice(it, n))
+        if not batch:
+            return
+        yield batch
+
+
+def _init_worker():
+    predict.load_inference_model()
+
+
+def score_batch(items):
+    """Score [(record_id, text or None, error or None)]; returns one output dict per item."""
+    model = predict.load_inference_model()
+    out = [None] * len(items)
+    short_idx, short_texts = [], []
+    for i, (rec_id, text, error) in enumerate(items):
+        if error is not None:
+            out[i] = {'id': rec_id, 'error': error}
+        elif len(text) > predict.LONG_DOC_CHARS:
+            proba, _, info = predict.score_long_text(text, model)
+            out[i] = _result(rec_id, model, proba, chunking=info)
+        else:
+            short_idx.append(i)
+            short_texts.append(text)
+    if short_texts:
+        short_docs = predict.preprocess_texts_for_vectorizer(short_texts, predict.uses_entity_normalization(model))
+        for i, proba in zip(short_idx, model.predict_proba(short_docs)):
+            out[i] = _result(items[i][0], model, proba)
+    return out
+
+
+def _result(rec_id, model, proba, chunking=None):
+    label = int(model.classes_[int(proba.argmax())])
+    res = {
+        'id': rec_id,
+        'label': label,
+        'prediction': LABEL_NAMES.get(label, str(label)),
+        'probabilities': {'fake': float(proba[0]), 'true': float(proba[1])},
+    }
+    if chunking is not None:
+        res['chunking'] = chunking
+    return res
+
+
+def _to_item(index, record, text_field, id_field, title_field):
+    if not isinstance(record, dict):
+        return index, None, 'record is not an object'
+    rec_id = record.get(id_field, index) if id_field else index
+    if '_error' in record:
+        return rec_id, None, record['_error']
+    text = record.get(text_field)
+    if not isinstance(text, str) or not text.strip():
+        return rec_id, None, f'missing or empty field: {text_field}'
+    title = record.get(title_field) if title_field else None
+    if isinstance(title, str) and title.strip():
+        text = f'{title} {text}'
+    return rec_id, text, None
+
+
+class JsonlWriter:
+    def __init__(self, path, checkpoint):
+        if checkpoint:
+            self.f = open(path, 'r+b')
+            self.f.truncate(checkpoint['output_bytes'])
+            self.f.seek(checkpoint['output_bytes'])
+        else:
+            self.f = open(path, 'wb')
+
+    def write(self, rows):
+        for row in rows:
+            self.f.write(json.dumps(row).encode('utf-8') + b'\n')
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def position(self):
+        return {'output_bytes': self.f.tell()}
+
+    def close(self):
+        self.f.close()
+
+
+def parquet_schema():
+    """One schema for every part file, whether a batch starts with (or holds only) scored or error rows."""
+    import pyarrow as pa
+    return pa.schema([
+        ('id', pa.string()),  # ids may be numbers in one record and strings in the next
+        ('label', pa.int64()),
+        ('prediction', pa.string()),
+        ('probabilities', pa.struct([('fake', pa.float64()), ('true', pa.float64())])),
+        ('chunking', pa.string()),  # JSON
+        ('error', pa.string()),
+        ('model_version', pa.string()),
+    ])
+
+
+class ParquetWriter:
+    """Writes each batch as its own part file in the output directory."""
+
+    def __init__(self, path, checkpoint):
+        import pyarrow  # noqa: F401  (fail early with a clear ImportError)
+        self.path = path
+        self.parts = checkpoint['parts'] if checkpoint else 0
+        self.schema = parquet_schema()
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            # parts written after the last checkpoint are redone
+            if name.startswith('part-') and int(name[5:11]) >= self.parts:
+                os.remove(os.path.join(path, name))
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        for row in rows:
+            row['id'] = None if row['id'] is None else str(row['id'])
+            if 'chunking' in row:
+                row['chunking'] = json.dumps(row['chunking'])
+        table = pa.Table.from_pylist(rows, schema=self.schema)
+        final = os.path.join(self.path, f'part-{self.parts:06d}.parquet')
+        pq.write_table(table, final + '.tmp')
+        os.replace(final + '.tmp', final)
+        self.parts += 1
+
+    def position(self):
+        return {'parts': self.parts}
+
+    def close(self):
+        pass
+
+
+def _load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_checkpoint(path, state):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def run_bulk(input_path, output_path, input_format=None, output_format=None, text_field='text',
+             id_field='id', title_field='title', batch_size=256, workers=None, resume=False):
+    if input_format is None:
+        input_format = 'csv' if input_path.lower().endswith('.csv') else 'jsonl'
+    if output_format is None:
+        output_format = 'parquet' if output_path.lower().endswith('.parquet') else 'jsonl'
+    workers = workers or os.cpu_count() or 1
+
+    checkpoint_path = output_path.rstrip(os.sep) + '.checkpoint.json'
+    checkpoint = _load_checkpoint(checkpoint_path) if resume else None
+    if not resume and os.path.exists(output_path):
+        raise FileExistsError(f'{output_path} exists; pass --resume to continue it or remove it first')
+    if checkpoint and checkpoint.get('output_format') != output_format:
+        raise ValueError('Checkpoint was written for a different output format')
+
+    writer = (ParquetWriter if output_format == 'parquet' else JsonlWriter)(output_path, checkpoint)
+    done = checkpoint['records_done'] if checkpoint else 0
+    if done:
+        print(f'Resuming after {done} records', file=sys.stderr)
+
+    model_version = predict.model_version()
+    records = itertools.islice(enumerate(read_records(input_path, input_format)), done, None)
+    batches = ([_to_item(i, rec, text_field, id_field, title_field) for i, rec in batch]
+               for batch in batched(records, batch_size))
+
+    def commit(rows):
+        nonlocal done
+        for row in rows:
+            row['model_version'] = model_version
+        writer.write(rows)
+        done += len(rows)
+        _save_checkpoint(checkpoint_path, {'records_done': done, 'output_format': output_format, **writer.position()})
+        print(f'\r{done} records scored', end='', file=sys.stderr, flush=True)
+
+    try:
+        if workers == 1:
+            for items in batches:
+                commit(score_batch(items))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                # keep at most 2 batches per worker in flight; results are committed in input order
+                pending = deque()
+                for items in batches:
+                    pending.append(pool.submit(score_batch, items))
+                    if len(pending) >= 2 * workers:
+                        commit(pending.popleft().result())
+                while pending:
+                    commit(pending.popleft().result())
+    finally:
+        writer.close()
+        print(file=sys.stderr)
+    return done
@@ -17,6 +17,7 @@ from bs4 import BeautifulSoup
 # Ensure predict module can be imported when running from project root
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 from predict import predict
+from deadline import NO_DEADLINE, DeadlineExceeded
 
 logging.basicConfig(level=logging.INFO)
 
@@ -28,14 +29,19 @@ USER_AGENTS = [
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
 ]
 
-def extract_with_newspaper(url):
-    a = Article(url)
+# Per-attempt timeouts (seconds); a request deadline can only shorten them
+NEWSPAPER_TIMEOUT = 10
+BS4_TIMEOUT = 15
+RETRY_DELAY = 2
+
+def extract_with_newspaper(url, deadline=NO_DEADLINE):
+    a = Article(url, request_timeout=deadline.timeout(NEWSPAPER_TIMEOUT))
     a.download()
     a.parse()
     return a.title or '', a.text or ''
 
-def extract_with_bs4(url, retries=3):
-    """Extract article using BeautifulSoup with simple retry logic"""
+def extract_with_bs4(url, retries=3, deadline=NO_DEADLINE):
+    """Extract article using BeautifulSoup with simple retry logic (no retry once the deadline is too close)"""
     headers = {
         'User-Agent': USER_AGENTS[0],
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8',
@@ -54,14 +60,21 @@ def extract_with_bs4(url, retries=3):
     last_error = None
     for attempt in range(retries):
         try:
-            resp = requests.get(url, timeout=15, headers=headers, allow_redirects=True)
+            resp = requests.get(url, timeout=deadline.timeout(BS4_TIMEOUT), headers=headers, allow_redirects=True)
             resp.raise_for_status()
             break
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             last_error = e
             if attempt < retries - 1:
+                if deadline.remaining() <= RETRY_DELAY:
+                    # no time for another attempt; only a timeout means the budget was the problem
+                    if isinstance(e, requests.Timeout):
+                        raise DeadlineExceeded(f'no time left to retry {url} ({e})')
+                    raise
                 logging.warning(f'Attempt {attempt + 1} failed, retrying... ({e})')
-                time.sleep(2)
+                time.sleep(RETRY_DELAY)
             continue
     else:
         raise last_error if last_error else Exception("Failed to fetch URL after retries")
@@ -107,15 +120,18 @@ def extract_with_bs4(url, retries=3):
     title = title_el.get_text() if title_el else ''
     return title, combined
 
-def fetch_article(url):
+def fetch_article(url, deadline=NO_DEADLINE):
+    """Return (title, text); raises DeadlineExceeded when the request budget runs out first."""
     if _HAS_NEWSPAPER:
         try:
-            return extract_with_newspaper(url)
+            return extract_with_newspaper(url, deadline)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logging.warning('newspaper extraction failed (%s), falling back to bs4', e)
     # fallback
     try:
-        return extract_with_bs4(url)
+        return extract_with_bs4(url, deadline=deadline)
     except Exception as e:
         logging.error(f'Both newspaper and bs4 extraction failed for {url}: {e}')
         raise
@@ -0,0 +1,262 @@
+"""
+Local fact-check claim store, queried before the remote Google Fact Check API.
+
+Claim reviews come from ClaimReview dumps (schema.org JSON/JSON-LD data feeds or JSONL)
+or from remote API responses, which check_claims_with_api writes through to this store.
+Claims are persisted in a JSONL file (CLAIM_INDEX_PATH, default claim_index.jsonl; set it
+to an empty string to disable the store) and indexed in memory with:
+  - an inverted BM25 index (always), and
+  - an optional embedding index built with the same all-MiniLM-L6-v2 model used for semantic
+    matching: faiss HNSW when faiss is installed, otherwise an exact numpy dot product.
+
+Search results use the same {'text', 'verdict', 'url'} review format as call_factcheck_api,
+so interpret_api_verdict works on them unchanged. Entries appended by other worker
+processes are picked up on the next restart.
+
+Import a dump:  python src/claim_index.py load claimreview_feed.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from preprocess import STOPWORDS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), '..', 'claim_index.jsonl')
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# A lexical hit must share this fraction of the query's terms and of the stored claim's terms
+LEXICAL_MIN_COVERAGE = 0.6
+SEMANTIC_MIN_SIMILARITY = 0.72
+MAX_HITS = 3  # the remote API path also keeps the top 3 claims
+
+
+def _terms(text):
+    return [t for t in re.findall(r'[a-z0-9]+', text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+def _normalize_claim(text):
+    return ' '.join(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+class ClaimIndex:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self.claims = []          # doc id -> claim text
+        self.reviews = []         # doc id -> [{'text', 'verdict', 'url'}]
+        self._by_key = {}         # normalized claim -> doc id
+        self._postings = defaultdict(list)  # term -> [(doc id, term frequency)]
+        self._doc_terms = []      # doc id -> number of distinct terms
+        self._doc_len = []
+        self._total_len = 0
+        self._embeddings = None   # numpy (n, d) or faiss index, built lazily
+        self._embedded = 0        # number of claims in the embedding index
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._add(entry['claim'], entry['reviews'])
+
+    def __len__(self):
+        return len(self.claims)
+
+    # ---- building ----
+
+    def _add(self, claim, reviews):
+        """Add or merge a claim in memory; returns True if anything new was stored."""
+        key = _normalize_claim(claim)
+        if not key or not reviews:
+            return False
+        doc_id = self._by_key.get(key)
+        if doc_id is not None:
+            known = {(r.get('url'), r.get('verdict')) for r in self.reviews[doc_id]}
+            new = [r for r in reviews if (r.get('url'), r.get('verdict')) not in known]
+            self.reviews[doc_id].extend(new)
+            return bool(new)
+        doc_id = len(self.claims)
+        self._by_key[key] = doc_id
+        self.claims.append(claim)
+        self.reviews.append(list(reviews))
+        terms = _terms(claim)
+        for term, tf in Counter(terms).items():
+            self._postings[term].append((doc_id, tf))
+        self._doc_terms.append(len(set(terms)))
+        self._doc_len.append(len(terms))
+        self._total_len += len(terms)
+        return True
+
+    def add(self, claim, reviews):
+        """Add a claim with its reviews and persist it."""
+        reviews = [{'text': claim, 'verdict': r.get('verdict'), 'url': r.get('url')} for r in reviews if r.get('verdict')]
+        with self._lock:
+            if self._add(claim, reviews) and self.path:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'claim': claim, 'reviews': reviews}) + '\n')
+
+    def add_api_response(self, raw):
+        """Store every claim of a raw Google Fact Check API claims:search response."""
+        for claim in (raw or {}).get('claims', []):
+            text = claim.get('text')
+            if text:
+                self.add(text, [{'verdict': r.get('textualRating'), 'url': r.get('url')}
+                                for r in claim.get('claimReview', [])])
+
+    def add_claim_review(self, item):
+        """Store a schema.org ClaimReview object."""
+        text = item.get('claimReviewed')
+        rating = item.get('reviewRating') or {}
+        verdict = rating.get('alternateName') or rating.get('name')
+        if text and verdict:
+            self.add(text, [{'verdict': verdict, 'url': item.get('url')}])
+
+    def load_dump(self, path):
+        """Load a ClaimReview data feed, a JSON list of ClaimReview objects, a claims:search
+        response, or JSONL of any of these. Returns the number of claims afterwards."""
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        try:
+            documents = [json.loads(content)]
+        except ValueError:
+            documents = [json.loads(line) for line in content.splitlines() if line.strip()]
+        for doc in documents:
+            for item in self._iter_claim_reviews(doc):
+                self.add_claim_review(item)
+            if isinstance(doc, dict) and 'claims' in doc:
+                self.add_api_response(doc)
+        return len(self)
+
+    @staticmethod
+    def _iter_claim_reviews(doc):
+        if isinstance(doc, list):
+            for d in doc:
+                yield from ClaimIndex._iter_claim_reviews(d)
+        elif isinstance(doc, dict):
+            if doc.get('@type') == 'ClaimReview' or 'claimReviewed' in doc:
+                yield doc
+            for key in ('dataFeedElement', 'item', '@graph'):
+                if key in doc:
+                    yield from ClaimIndex._iter_claim_reviews(doc[key])
+
+    # ---- search ----
+
+    def search(self, query, encoder=None, min_similarity=SEMANTIC_MIN_SIMILARITY, max_hits=MAX_HITS):
+        """Reviews of stored claims matching query (lexically, or semantically when encoder is given).
+
+        Returns an empty list on a miss.
+        """
+        with self._lock:
+            hits = self._search_bm25(query, max_hits)
+            if not hits and encoder is not None and len(self):
+                try:
+                    hits = self._search_embeddings(query, encoder, min_similarity, max_hits)
+                except Exception as e:
+                    logger.warning('Claim index: embedding search failed (%s)', e)
+            return [review for doc_id in hits for review in self.reviews[doc_id]]
+
+    def _search_bm25(self, query, max_hits):
+        q_terms = set(_terms(query))
+        if not q_terms or not self.claims:
+            return []
+        n = len(self.claims)
+        avgdl = self._total_len / n
+        scores = defaultdict(float)
+        matched = Counter()
+        for term in q_terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                dl = self._doc_len[doc_id]
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+                matched[doc_id] += 1
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [d for d in ranked
+                if matched[d] / len(q_terms) >= LEXICAL_MIN_COVERAGE
+                and matched[d] / max(1, self._doc_terms[d]) >= LEXICAL_MIN_COVERAGE][:max_hits]
+
+    def _search_embeddings(self, query, encoder, min_similarity, max_hits):
+        model = encoder()
+        self._update_embeddings(model)
+        q = model.encode([query], normalize_embeddings=True).astype(np.float32)
+        if isinstance(self._embeddings, np.ndarray):
+            sims = self._embeddings @ q[0]
+            top = np.argsort(-sims)[:max_hits]
+            pairs = [(int(i), float(sims[i])) for i in top]
+        else:
+            sims, ids = self._embeddings.search(q, max_hits)
+            pairs = [(int(i), float(s)) for i, s in zip(ids[0], sims[0]) if i >= 0]
+        return [i for i, s in pairs if s >= min_similarity]
+
+    def _update_embeddings(self, model):
+        """Embed claims added since the last call (the first call embeds the whole store)."""
+        if self._embedded == len(self.claims):
+            return
+        new = model.encode(self.claims[self._embedded:], normalize_embeddings=True, batch_size=256).astype(np.float32)
+        if self._embeddings is None:
+            try:
+                import faiss
+                self._embeddings = faiss.IndexHNSWFlat(new.shape[1], 32, faiss.METRIC_INNER_PRODUCT)
+            except ImportError:
+                self._embeddings = np.empty((0, new.shape[1]), dtype=np.float32)
+        if isinstance(self._embeddings, np.ndarray):
+            self._embeddings = np.vstack([self._embeddings, new])
+        else:
+            self._embeddings.add(new)
+        self._embedded = len(self.claims)
+
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_index():
+    """Process-wide claim index, or None when disabled (CLAIM_INDEX_PATH='')."""
+    global _INDEX
+    path = os.environ.get('CLAIM_INDEX_PATH', DEFAULT_PATH)
+    if not path:
+        return None
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = ClaimIndex(path)
+    return _INDEX
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage the local fact-check claim index')
+    sub = parser.add_subparsers(dest='command', required=True)
+    load = sub.add_parser('load', help='Import ClaimReview dumps or saved API responses')
+    load.add_argument('files', nargs='+')
+    search = sub.add_parser('search', help='Query the index')
+    search.add_argument('query')
+    search.add_argument('--semantic', action='store_true', help='Fall back to embedding search')
+    args = parser.parse_args()
+
+    index = get_index()
+    if index is None:
+        parser.error('claim index disabled (CLAIM_INDEX_PATH is empty)')
+    if args.command == 'load':
+        for path in args.files:
+            print(f'{path}: index now holds {index.load_dump(path)} claims')
+    else:
+        encoder = None
+        if args.semantic:
+            from predict import _load_st_model
+            encoder = _load_st_model
+        for review in index.search(args.query, encoder=encoder):
+            print(f"{review['verdict']:20} {review['text'][:100]}  {review['url']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Per-request latency budget.
+
+A Deadline is created when a request arrives and passed down through fetch_article,
+predict and check_claims_with_api. Each stage asks for timeout(cap): its usual timeout,
+shortened to whatever is left of the budget. Stages that can be skipped (retries, extra
+chunks, fact-check calls) check expired() and stop early, so the endpoint can still
+answer with what it has (e.g. a model-only verdict).
+"""
+
+import math
+import time
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a stage cannot start because the request's time budget is used up."""
+
+
+class Deadline:
+    def __init__(self, seconds=None):
+        """seconds=None means no budget (every timeout keeps its cap)."""
+        self.budget = seconds
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self):
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap):
+        """Timeout for the next stage: min(cap, remaining budget). Raises DeadlineExceeded if none is left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f'request time budget of {self.budget}s exhausted')
+        return min(cap, remaining)
+
+
+NO_DEADLINE = Deadline(None)
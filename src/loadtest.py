@@ -0,0 +1,339 @@
+"""
+End-to-end load-testing harness for the Flask app.
+
+Starts local stand-in servers for the Google Fact Check API and for article hosts
+(both with configurable latency and error rates), points the app at them and drives
+/api/predict, /api/url and /api/explain at a configurable concurrency.
+Reports throughput and p50/p95/p99 latency per endpoint.
+
+The in-process app runs with the verdict cache, near-duplicate index and local claim index
+disabled, so every request does the full work (model, fact-check fallback, retries) and
+stand-in data never reaches the real claim_index.jsonl / near_duplicates.sqlite3. Pass
+--keep-caches to measure with the caches on; they then live in a temporary directory.
+
+Example:
+    python src/loadtest.py --concurrency 16 --requests 500 --factcheck-latency-ms 300 --article-error-rate 0.2
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+SAMPLE_SENTENCES = [
+    'The government announced a new infrastructure plan on Monday.',
+    'Scientists confirmed that the vaccine passed its final clinical trial.',
+    'A celebrity was secretly replaced by a clone, according to anonymous sources.',
+    'The central bank raised interest rates by a quarter of a percentage point.',
+    'Drinking bleach cures all known viruses, the post claims.',
+    'Officials said the storm caused widespread power outages across the state.',
+    'The moon landing was staged in a television studio, a viral video alleges.',
+    'The city council approved the budget after a lengthy public hearing.',
+    'Researchers published the study in a peer-reviewed medical journal.',
+    'Aliens have been living among us for decades, an insider revealed.',
+]
+
+VERDICTS = ['False', 'True', 'Mostly false', 'Mostly true', 'Mixture', 'Pants on Fire']
+
+
+class StandInConfig:
+    """Latency/error settings for a stand-in server."""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hits = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, outcome):
+        with self.lock:
+            self.hits[outcome] += 1
+
+    def delay(self):
+        ms = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if ms > 0:
+            time.sleep(ms / 1000.0)
+
+    def should_fail(self):
+        return random.random() < self.error_rate
+
+
+def _make_handler(config, body_fn, content_type):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            config.delay()
+            if config.should_fail():
+                config.record(config.error_status)
+                self.send_response(config.error_status)
+                self.end_headers()
+                return
+            status, body = body_fn(self.path)
+            config.record(status)
+            payload = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def factcheck_body(path):
+    """Mimic the claims:search response shape of the Google Fact Check API."""
+    query = parse_qs(urlparse(path).query).get('query', [''])[0]
+    n_claims = random.randint(0, 3)
+    claims = []
+    for i in range(n_claims):
+        claims.append({
+            'text': query,
+            'claimReview': [{
+                'textualRating': random.choice(VERDICTS),
+                'url': f'https://factcheck.example/review/{abs(hash(query)) % 100000}/{i}',
+            }],
+        })
+    return 200, json.dumps({'claims': claims} if claims else {})
+
+
+def article_body(path):
+    """Serve a synthetic news article; /article/<n> is deterministic in n."""
+    parts = urlparse(path).path.strip('/').split('/')
+    if len(parts) != 2 or parts[0] != 'article':
+        return 404, '<html><body><p>Not found</p></body></html>'
+    rng = random.Random(parts[1])
+    paragraphs = ''.join(
+        f'<p>{" ".join(rng.choice(SAMPLE_SENTENCES) for _ in range(rng.randint(2, 5)))}</p>'
+        for _ in range(rng.randint(3, 12))
+    )
+    title = rng.choice(SAMPLE_SENTENCES).rstrip('.')
+    return 200, f'<html><head><title>{title}</title></head><body><article>{paragraphs}</article></body></html>'
+
+
+class QuietThreadingHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # clients giving up (timeouts, request deadlines) are expected under load
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_stand_in(config, body_fn, content_type, port=0):
+    """Start a stand-in server (ephemeral port by default); returns (server, base_url)."""
+    server = QuietThreadingHTTPServer(('127.0.0.1', port), _make_handler(config, body_fn, content_type))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f'http://{host}:{port}'
+
+
+def isolate_app_state(keep_caches=False):
+    """Point the app's persistent caches at a temp dir (or disable them); call before importing the app."""
+    state_dir = tempfile.mkdtemp(prefix='loadtest-')
+    os.environ['NEAR_DUP_DB'] = os.path.join(state_dir, 'near_duplicates.sqlite3')
+    os.environ.pop('VERDICT_CACHE_REDIS_URL', None)
+    if keep_caches:
+        os.environ['CLAIM_INDEX_PATH'] = os.path.join(state_dir, 'claim_index.jsonl')
+    else:
+        os.environ['CLAIM_INDEX_PATH'] = ''
+        os.environ['NEAR_DUP_MAX_ENTRIES'] = '0'
+        os.environ['VERDICT_CACHE_SIZE'] = '0'
+    return state_dir
+
+
+def start_app_in_process():
+    """Run app.py in a threaded werkzeug server in this process; returns (server, base_url)."""
+    from werkzeug.serving import make_server
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from app import app
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def parse_mix(mix):
+    """Parse 'predict=0.5,url=0.3,explain=0.2' into a list of (endpoint, weight)."""
+    weights = []
+    for part in mix.split(','):
+        name, _, w = part.partition('=')
+        name = name.strip()
+        if name not in ('predict', 'url', 'explain'):
+            raise ValueError(f'Unknown endpoint in mix: {name}')
+        weights.append((name, float(w or 1)))
+    return weights
+
+
+def make_request(endpoint, article_base):
+    """Build (path, json_payload) for one request to the given endpoint."""
+    if endpoint == 'url':
+        return '/api/url', {'url': f'{article_base}/article/{random.randint(0, 999)}'}
+    text = ' '.join(random.choice(SAMPLE_SENTENCES) for _ in range(random.randint(1, 6)))
+    return f'/api/{endpoint}', {'text': text}
+
+
+def run_load(base_url, article_base, mix, concurrency, total_requests=None, duration=None, timeout=120):
+    """Drive the app and collect (endpoint, status, latency_seconds) samples."""
+    endpoints, weights = zip(*mix)
+    samples = []
+    samples_lock = threading.Lock()
+    deadline = time.monotonic() + duration if duration else None
+    issued = [0]
+    issued_lock = threading.Lock()
+
+    def next_slot():
+        with issued_lock:
+            if total_requests is not None and issued[0] >= total_requests:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            issued[0] += 1
+            return True
+
+    def worker():
+        session = requests.Session()
+        while next_slot():
+            endpoint = random.choices(endpoints, weights)[0]
+            path, payload = make_request(endpoint, article_base)
+            start = time.perf_counter()
+            try:
+                status = session.post(base_url + path, json=payload, timeout=timeout).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            with samples_lock:
+                samples.append((endpoint, status, elapsed))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    return samples, wall
+
+
+def summarize(samples, wall):
+    """Aggregate samples into per-endpoint throughput/latency stats."""
+    groups = defaultdict(list)
+    for endpoint, status, elapsed in samples:
+        groups[endpoint].append((status, elapsed))
+        groups['ALL'].append((status, elapsed))
+    report = {}
+    for endpoint, rows in groups.items():
+        latencies = sorted(e for _, e in rows)
+        statuses = Counter(str(s) for s, _ in rows)
+        report[endpoint] = {
+            'requests': len(rows),
+            'throughput_rps': len(rows) / wall if wall else 0.0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+            'statuses': dict(statuses),
+        }
+    return report
+
+
+def print_report(report, wall, factcheck_cfg, article_cfg):
+    print(f'\n--- Load test results ({wall:.1f}s wall) ---')
+    print(f"{'endpoint':10} {'reqs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  statuses")
+    for endpoint in sorted(report, key=lambda k: (k == 'ALL', k)):
+        r = report[endpoint]
+        print(f"{endpoint:10} {r['requests']:6d} {r['throughput_rps']:8.2f} {r['p50_ms']:9.1f} {r['p95_ms']:9.1f} "
+              f"{r['p99_ms']:9.1f} {r['max_ms']:9.1f}  {r['statuses']}")
+    print(f'\nFact-check stand-in hits: {dict(factcheck_cfg.hits)}')
+    print(f'Article stand-in hits:    {dict(article_cfg.hits)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the Fake News Detector API against local stand-in services')
+    parser.add_argument('--base-url', help='Target an already running app instead of starting one in-process '
+                                           '(start it with FACTCHECK_API_URL/FACTCHECK_API_KEY pointing at the stand-in, '
+                                           'and CLAIM_INDEX_PATH/NEAR_DUP_DB away from the real files)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Total requests (ignored when --duration is set)')
+    parser.add_argument('--duration', type=float, help='Run for this many seconds instead of a fixed request count')
+    parser.add_argument('--mix', default='predict=0.5,url=0.3,explain=0.2', help='Endpoint weights')
+    parser.add_argument('--timeout', type=float, default=120, help='Client-side timeout per request (seconds)')
+    parser.add_argument('--factcheck-latency-ms', type=float, default=200)
+    parser.add_argument('--factcheck-jitter-ms', type=float, default=50)
+    parser.add_argument('--factcheck-error-rate', type=float, default=0.05)
+    parser.add_argument('--article-latency-ms', type=float, default=300)
+    parser.add_argument('--article-jitter-ms', type=float, default=100)
+    parser.add_argument('--article-error-rate', type=float, default=0.05)
+    parser.add_argument('--article-error-status', type=int, default=503)
+    parser.add_argument('--factcheck-port', type=int, default=0, help='Fixed port for the fact-check stand-in (useful with --base-url)')
+    parser.add_argument('--article-port', type=int, default=0, help='Fixed port for the article stand-in')
+    parser.add_argument('--keep-caches', action='store_true',
+                        help='Keep the verdict cache, near-duplicate and claim indexes on (in a temp dir)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible request mixes')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    factcheck_cfg = StandInConfig(args.factcheck_latency_ms, args.factcheck_jitter_ms, args.factcheck_error_rate)
+    article_cfg = StandInConfig(args.article_latency_ms, args.article_jitter_ms, args.article_error_rate,
+                                args.article_error_status)
+    factcheck_server, factcheck_base = start_stand_in(factcheck_cfg, factcheck_body, 'application/json',
+                                                       args.factcheck_port)
+    article_server, article_base = start_stand_in(article_cfg, article_body, 'text/html; charset=utf-8',
+                                                   args.article_port)
+    print(f'Fact-check stand-in: {factcheck_base}/v1alpha1/claims:search')
+    print(f'Article stand-in:    {article_base}/article/<n>')
+
+    app_server = None
+    if args.base_url:
+        base_url = args.base_url.rstrip('/')
+    else:
+        # Must be set before the app (and predict) is imported
+        os.environ['FACTCHECK_API_URL'] = f'{factcheck_base}/v1alpha1/claims:search'
+        os.environ['FACTCHECK_API_KEY'] = 'loadtest'
+        print(f'App state directory: {isolate_app_state(args.keep_caches)}')
+        app_server, base_url = start_app_in_process()
+    print(f'Target app:          {base_url}')
+
+    try:
+        samples, wall = run_load(base_url, article_base, parse_mix(args.mix), args.concurrency,
+                                 total_requests=None if args.duration else args.requests,
+                                 duration=args.duration, timeout=args.timeout)
+    finally:
+        if app_server is not None:
+            app_server.shutdown()
+        factcheck_server.shutdown()
+        article_server.shutdown()
+
+    report = summarize(samples, wall)
+    if args.json:
+        print(json.dumps({'wall_seconds': wall, 'endpoints': report,
+                          'factcheck_hits': dict(factcheck_cfg.hits), 'article_hits': dict(article_cfg.hits)},
+                         indent=2, default=str))
+    else:
+        print_report(report, wall, factcheck_cfg, article_cfg)
+
+
+if __name__ == '__main__':
+    main()
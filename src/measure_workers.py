@@ -0,0 +1,142 @@
+"""
+Measure startup time and per-worker resident memory of the production server (serve.py).
+
+Starts serve.py with the requested worker count, waits until /api/health answers,
+sends a few warm-up predictions, then reads /proc/<pid>/smaps_rollup for the master
+and every worker. Rss counts shared pages in full; Pss splits them across the
+processes sharing them, so Pss is the real per-worker cost.
+
+Linux only (needs /proc). Example:
+    python src/measure_workers.py --workers 4 --compare
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import requests
+
+import admission
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SMAPS_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def read_smaps_rollup(pid):
+    """Return the smaps_rollup fields of a process in KiB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts and parts[0].rstrip(':') in SMAPS_FIELDS:
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return values
+
+
+def child_pids(pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # the command name may contain spaces; ppid is the 2nd field after the closing paren
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def measure(workers, threads, preload, warm_requests, startup_timeout):
+    port = free_port()
+    cmd = [sys.executable, os.path.join(ROOT, 'serve.py'), '--bind', f'127.0.0.1:{port}',
+           '--workers', str(workers), '--threads', str(threads)]
+    if not preload:
+        cmd.append('--no-preload')
+    base = f'http://127.0.0.1:{port}'
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f'serve.py exited with code {proc.returncode}')
+            if time.perf_counter() - start > startup_timeout:
+                raise RuntimeError('server did not become healthy in time')
+            try:
+                if requests.get(base + '/api/health', timeout=1).ok:
+                    break
+            except requests.RequestException:
+                time.sleep(0.1)
+        startup = time.perf_counter() - start
+
+        # Wait for every worker to be forked, then push requests through them so
+        # per-request allocations show up in the numbers
+        deadline = time.perf_counter() + startup_timeout
+        while len(child_pids(proc.pid)) < workers and time.perf_counter() < deadline:
+            time.sleep(0.1)
+        first_request = None
+        for i in range(warm_requests):
+            t0 = time.perf_counter()
+            requests.post(base + '/api/predict', json={'text': 'Officials confirmed the report on Monday.'}, timeout=60)
+            if i == 0:
+                first_request = time.perf_counter() - t0
+
+        master = read_smaps_rollup(proc.pid)
+        per_worker = {pid: read_smaps_rollup(pid) for pid in child_pids(proc.pid)}
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return {'startup_s': startup, 'first_request_s': first_request, 'master': master, 'workers': per_worker}
+
+
+def print_result(label, result):
+    print(f'\n=== {label} ===')
+    print(f"Startup until healthy: {result['startup_s']:.2f}s")
+    if result['first_request_s'] is not None:
+        print(f"First /api/predict:    {result['first_request_s'] * 1000:.0f}ms")
+    print(f"{'process':>14} " + ' '.join(f'{name:>14}' for name in SMAPS_FIELDS) + '   (MiB)')
+    rows = [('master', result['master'])] + [(f'worker {pid}', v) for pid, v in result['workers'].items()]
+    for name, values in rows:
+        print(f'{name:>14} ' + ' '.join(f'{values.get(field, 0) / 1024:14.1f}' for field in SMAPS_FIELDS))
+    total_pss = sum(v.get('Pss', 0) for _, v in rows) / 1024
+    print(f'Total Pss (real memory used by the whole server): {total_pss:.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure serve.py startup time and per-worker memory')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=admission.default_threads(),
+                        help="Threads per worker (default: serve.py's, the admission lanes' concurrency + %d)"
+                             % admission.SPARE_THREADS)
+    parser.add_argument('--warm-requests', type=int, default=20, help='Requests sent before measuring')
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--compare', action='store_true', help='Also measure without preloading (model loaded per worker)')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit('This script needs Linux /proc/<pid>/smaps_rollup')
+
+    print_result(f'preload, {args.workers} workers',
+                 measure(args.workers, args.threads, True, args.warm_requests, args.startup_timeout))
+    if args.compare:
+        print_result(f'no preload, {args.workers} workers',
+                     measure(args.workers, args.threads, False, args.warm_requests, args.startup_timeout))
+
+
+if __name__ == '__main__':
+    main()
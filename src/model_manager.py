@@ -0,0 +1,183 @@
+"""
+Memory budget for the optional heavy models (sentence-transformers, spaCy).
+
+Each optional model is registered with a loader and fetched with get(name): the first call
+loads it, later calls reuse it. A loaded model is dropped again when
+  - it has not been used for MODEL_IDLE_TIMEOUT seconds (checked by a background thread;
+    0 disables idle eviction), or
+  - loading another model pushes the total resident size past MODEL_MEMORY_BUDGET_MB
+    (least recently used models go first; 0 means no budget).
+The next get() reloads it. Resident size is the growth of the process RSS during the load,
+so it is approximate when other threads allocate at the same time.
+
+Loads and evictions are logged at INFO, hits at DEBUG; all three are counted, and stats()
+reports them per model (served by /api/models). Like the admission lanes, everything here
+is per process.
+"""
+
+import ctypes
+import gc
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+MODEL_IDLE_TIMEOUT = float(os.environ.get('MODEL_IDLE_TIMEOUT', 600))
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+
+
+def resident_bytes():
+    """Current resident set size of this process (0 when it cannot be read)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return 0
+
+
+def _release_memory():
+    gc.collect()
+    # glibc keeps freed arenas mapped; hand them back so the RSS actually drops
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class _Entry:
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.model = None
+        self.size_bytes = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_s = None
+        self.load_lock = threading.Lock()  # one load per model at a time; other models stay usable
+
+
+class ModelManager:
+    def __init__(self, idle_timeout=MODEL_IDLE_TIMEOUT, budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.idle_timeout = idle_timeout
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._entries = {}
+        self._lock = threading.RLock()
+        self._reaper_pid = None
+
+    def register(self, name, loader):
+        """Register an optional model; loader() returns it, or None when it is unavailable."""
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = _Entry(name, loader)
+
+    def get(self, name):
+        """The model, loading it if it is not resident. Returns None if the loader did."""
+        entry = self._entries[name]
+        with entry.load_lock:
+            with self._lock:
+                entry.last_used = time.monotonic()
+                if entry.model is not None:
+                    entry.hits += 1
+                    logger.debug('Model manager: hit %s (%d hits)', name, entry.hits)
+                    return entry.model
+            before = resident_bytes()
+            started = time.perf_counter()
+            model = entry.loader()
+            if model is None:
+                return None
+            with self._lock:
+                entry.model = model
+                entry.load_s = time.perf_counter() - started
+                entry.size_bytes = max(0, resident_bytes() - before)
+                entry.loads += 1
+                over_budget = self._over_budget(keep=name)
+        logger.info('Model manager: loaded %s (%.1f MB, %.2fs)', name, entry.size_bytes / 2**20, entry.load_s)
+        for other in over_budget:
+            self.evict(other, reason='over budget')
+        self._ensure_reaper()
+        return model
+
+    def evict(self, name, reason='manual'):
+        """Drop a resident model; returns True if it was loaded."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.model is None:
+                return False
+            entry.model = None
+            entry.evictions += 1
+            freed, entry.size_bytes = entry.size_bytes, 0
+        _release_memory()
+        logger.info('Model manager: evicted %s (%s, ~%.1f MB)', name, reason, freed / 2**20)
+        return True
+
+    def evict_idle(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [e.name for e in self._entries.values()
+                    if e.model is not None and now - e.last_used >= self.idle_timeout]
+        for name in idle:
+            self.evict(name, reason='idle')
+        return idle
+
+    def _over_budget(self, keep):
+        """Least recently used models (other than keep) to evict to get back under the budget."""
+        if not self.budget_bytes:
+            return []
+        resident = sorted((e for e in self._entries.values() if e.model is not None and e.name != keep),
+                          key=lambda e: e.last_used)
+        total = sum(e.size_bytes for e in self._entries.values() if e.model is not None)
+        victims = []
+        for entry in resident:
+            if total <= self.budget_bytes:
+                break
+            total -= entry.size_bytes
+            victims.append(entry.name)
+        if total > self.budget_bytes:
+            logger.warning('Model manager: %s alone exceeds the memory budget (%.1f MB > %.1f MB)',
+                           keep, total / 2**20, self.budget_bytes / 2**20)
+        return victims
+
+    def _ensure_reaper(self):
+        # threads do not survive a fork, so each worker starts its own after its first load
+        with self._lock:
+            if self.idle_timeout <= 0 or self._reaper_pid == os.getpid():
+                return
+            self._reaper_pid = os.getpid()
+        threading.Thread(target=self._reap, name='model-reaper', daemon=True).start()
+
+    def _reap(self):
+        interval = min(60.0, max(1.0, self.idle_timeout / 4))
+        while True:
+            time.sleep(interval)
+            self.evict_idle()
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'idle_timeout_s': self.idle_timeout,
+                'budget_mb': round(self.budget_bytes / 2**20, 1) if self.budget_bytes else None,
+                'resident_mb': round(sum(e.size_bytes for e in self._entries.values()) / 2**20, 1),
+                'process_rss_mb': round(resident_bytes() / 2**20, 1),
+                'models': {e.name: {
+                    'loaded': e.model is not None,
+                    'size_mb': round(e.size_bytes / 2**20, 1),
+                    'idle_s': round(now - e.last_used, 1) if e.model is not None else None,
+                    'loads': e.loads,
+                    'hits': e.hits,
+                    'evictions': e.evictions,
+                    'last_load_s': round(e.load_s, 2) if e.load_s is not None else None,
+                } for e in self._entries.values()},
+            }
+
+
+MANAGER = ModelManager()
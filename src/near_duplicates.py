@@ -0,0 +1,185 @@
+"""
+Near-duplicate index of previously checked articles.
+
+Syndicated stories are republished with small edits, so exact-match caching misses them.
+Each checked article gets a MinHash signature over its word 5-gram shingles; locality-
+sensitive hashing (NUM_BANDS bands of ROWS_PER_BAND rows) puts similar signatures in a
+shared bucket, so a lookup only compares against the few candidates that share a
+bucket instead of scanning every stored article.
+
+The index lives in SQLite (WAL mode), so it persists across restarts and is shared by
+all workers. It keeps at most max_entries articles and evicts the least recently used.
+
+Settings (environment): NEAR_DUP_DB (path), NEAR_DUP_MAX_ENTRIES (default 50000; 0 disables),
+NEAR_DUP_THRESHOLD (estimated Jaccard similarity, default 0.8).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'near_duplicates.sqlite3')
+
+NUM_PERM = 128
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS  # 16 bands x 8 rows: candidate probability 50% at similarity ~0.7
+SHINGLE_WORDS = 5
+MIN_WORDS = 50  # shorter texts are too small to compare reliably
+SEED = 1
+
+_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(SEED)
+# a < 2^31 and shingle hashes < 2^32 keep a*h + b below 2^64
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM).astype(np.uint64)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ref TEXT,
+    model_version TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    payload TEXT NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    entry_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, bucket);
+CREATE INDEX IF NOT EXISTS bands_entry ON bands (entry_id);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+CREATE INDEX IF NOT EXISTS entries_ref ON entries (ref);
+"""
+
+
+def shingles(text):
+    """Set of 32-bit hashes of the word 5-grams of text."""
+    words = re.findall(r'[a-z0-9]+', text.lower())
+    if len(words) < MIN_WORDS:
+        return set()
+    return {zlib.crc32(' '.join(words[i:i + SHINGLE_WORDS]).encode('utf-8'))
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(shingle_set):
+    """MinHash signature (NUM_PERM uint64 values) of a non-empty shingle set."""
+    h = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    sig = np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    # blocks keep the (shingles x permutations) matrix small for very long articles
+    for start in range(0, len(h), 2048):
+        block = (np.outer(h[start:start + 2048], _PERM_A) + _PERM_B) % _PRIME
+        np.minimum(sig, block.min(axis=0), out=sig)
+    return sig
+
+
+def band_buckets(signature):
+    """One signed 64-bit bucket id per LSH band."""
+    buckets = []
+    for band in range(NUM_BANDS):
+        chunk = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        buckets.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), 'little', signed=True))
+    return buckets
+
+
+class NearDuplicateIndex:
+    def __init__(self, path=DEFAULT_DB_PATH, max_entries=50000, threshold=0.8):
+        self.path = path
+        self.max_entries = max_entries
+        self.threshold = threshold
+        if self.enabled:
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def find(self, text, model_version):
+        """Return {'ref', 'similarity', 'payload'} of the most similar stored article, or None."""
+        if not self.enabled:
+            return None
+        sh = shingles(text)
+        if not sh:
+            return None
+        sig = minhash(sh)
+        with self._connect() as conn:
+            candidate_ids = set()
+            for band, bucket in enumerate(band_buckets(sig)):
+                rows = conn.execute('SELECT entry_id FROM bands WHERE band = ? AND bucket = ?', (band, bucket))
+                candidate_ids.update(r[0] for r in rows)
+            if not candidate_ids:
+                return None
+            placeholders = ','.join('?' * len(candidate_ids))
+            rows = conn.execute(f'SELECT id, ref, signature, payload FROM entries '
+                                f'WHERE model_version = ? AND id IN ({placeholders})',
+                                (model_version, *candidate_ids)).fetchall()
+            best = None
+            for entry_id, ref, blob, payload in rows:
+                similarity = float((np.frombuffer(blob, dtype=np.uint64) == sig).mean())
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (entry_id, similarity, ref, payload)
+            if best is None:
+                return None
+            conn.execute('UPDATE entries SET last_used = ? WHERE id = ?', (time.time(), best[0]))
+        return {'ref': best[2], 'similarity': best[1], 'payload': json.loads(best[3])}
+
+    def add(self, text, ref, payload, model_version):
+        """Index a checked article; replaces an earlier entry with the same ref."""
+        if not self.enabled:
+            return
+        sh = shingles(text)
+        if not sh:
+            return
+        sig = minhash(sh)
+        now = time.time()
+        with self._connect() as conn:
+            if ref is not None:
+                old = [r[0] for r in conn.execute('SELECT id FROM entries WHERE ref = ?', (ref,))]
+                self._delete(conn, old)
+            cur = conn.execute('INSERT INTO entries (ref, model_version, signature, payload, created, last_used) '
+                               'VALUES (?, ?, ?, ?, ?, ?)',
+                               (ref, model_version, sig.tobytes(), json.dumps(payload), now, now))
+            conn.executemany('INSERT INTO bands (band, bucket, entry_id) VALUES (?, ?, ?)',
+                             [(band, bucket, cur.lastrowid) for band, bucket in enumerate(band_buckets(sig))])
+            excess = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+            if excess > 0:
+                oldest = [r[0] for r in conn.execute('SELECT id FROM entries ORDER BY last_used LIMIT ?', (excess,))]
+                self._delete(conn, oldest)
+
+    @staticmethod
+    def _delete(conn, ids):
+        if not ids:
+            return
+        placeholders = ','.join('?' * len(ids))
+        conn.execute(f'DELETE FROM bands WHERE entry_id IN ({placeholders})', ids)
+        conn.execute(f'DELETE FROM entries WHERE id IN ({placeholders})', ids)
+
+    def stats(self):
+        if not self.enabled:
+            return {'entries': 0, 'enabled': False}
+        with self._connect() as conn:
+            return {'entries': conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0], 'enabled': True}
+
+
+def from_env():
+    return NearDuplicateIndex(
+        path=os.environ.get('NEAR_DUP_DB', DEFAULT_DB_PATH),
+        max_entries=int(os.environ.get('NEAR_DUP_MAX_ENTRIES', 50000)),
+        threshold=float(os.environ.get('NEAR_DUP_THRESHOLD', 0.8)),
+    )
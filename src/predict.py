@@ -1,32 +1,227 @@
 import os
+import re
+import json
+import hashlib
 import joblib
+import numpy as np
 import requests
-from preprocess import preprocess_text_for_vectorizer, tokenize_and_lemmatize
+from preprocess import preprocess_text_for_vectorizer, preprocess_texts_for_vectorizer, tokenize_and_lemmatize
 from nltk.corpus import wordnet as wn
 from claims import extract_candidate_claims
+from claim_index import get_index as get_claim_index
+from deadline import NO_DEADLINE
+from model_manager import MANAGER as MODEL_MANAGER
+from nltk.tokenize import sent_tokenize
 from typing import List
 import math
 
-# Lazy load sentence-transformers model for semantic matching
-_ST_MODEL = None
+# Lazy load sentence-transformers model for semantic matching (evicted again when idle, see model_manager)
+def _create_st_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('all-MiniLM-L6-v2')
+
+MODEL_MANAGER.register('sentence_transformer', _create_st_model)
+
 def _load_st_model():
-    global _ST_MODEL
-    if _ST_MODEL is None:
-        from sentence_transformers import SentenceTransformer
-        _ST_MODEL = SentenceTransformer('all-MiniLM-L6-v2')
-    return _ST_MODEL
+    return MODEL_MANAGER.get('sentence_transformer')
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model.joblib')
+COMPACT_MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'model_compact')
+
+# Long-document mode: texts longer than LONG_DOC_CHARS are split into sentence-aligned chunks and
+# scored a batch at a time until the running verdict is confident (or MAX_CHUNKS have been scored)
+LONG_DOC_CHARS = 5000
+CHUNK_CHARS = 1500
+CHUNK_BATCH_SIZE = 4
+MAX_CHUNKS = 40
+EARLY_EXIT_MIN_CHUNKS = 4
+EARLY_EXIT_CONFIDENCE = 0.9
+LONG_DOC_MAX_CLAIMS = 20
+
+# Timeout (seconds) of one fact-check API call; a request deadline can only shorten it
+FACTCHECK_TIMEOUT = 10
 
 # Fact-check API settings - using Google Fact Check API
-FACTCHECK_API_URL = 'https://factchecktools.googleapis.com/v1alpha1/claims:search'
+# FACTCHECK_API_URL / FACTCHECK_API_KEY env vars override the defaults (e.g. to point at a local stand-in server)
+FACTCHECK_API_URL = os.environ.get('FACTCHECK_API_URL', 'https://factchecktools.googleapis.com/v1alpha1/claims:search')
 API_KEY_FILE = os.path.join(os.path.dirname(__file__), '..', 'Api key.txt')
 
+# Loaded model cache: path -> (file signature, model). The signature lets a retrained model be picked up.
+_MODEL_CACHE = {}
+
+def _file_signature(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
 def load_model():
+    """Load (once) the calibrated pipeline; numpy arrays are memory-mapped read-only so forked workers share pages."""
     if not os.path.exists(MODEL_PATH):
         raise FileNotFoundError(f'Model not found at {MODEL_PATH}. Run training first.')
-    pipeline = joblib.load(MODEL_PATH)
-    return pipeline
+    sig = _file_signature(MODEL_PATH)
+    cached = _MODEL_CACHE.get(MODEL_PATH)
+    if cached is None or cached[0] != sig:
+        pipeline = joblib.load(MODEL_PATH, mmap_mode='r')
+        _MODEL_CACHE[MODEL_PATH] = (sig, pipeline)
+        return pipeline
+    return cached[1]
+
+class CompactModel:
+    """Inference-only model written by train.export_compact_model.
+
+    Reproduces CalibratedClassifierCV(TfidfVectorizer + LogisticRegression).predict_proba from flat
+    arrays: documents are tokenized once against the merged vocabulary, then every fold's TF-IDF
+    weighting, linear score and calibration are applied in a vectorized pass.
+    """
+
+    def __init__(self, path=COMPACT_MODEL_DIR, mmap_mode='r'):
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format_version') != 1:
+            raise ValueError(f"Unsupported compact model format: {meta.get('format_version')}")
+        with open(os.path.join(path, 'vocab.txt'), 'r', encoding='utf-8') as f:
+            self.terms = f.read().split('\n')
+        self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+        self.idf = load('idf.npy')
+        self.coef = load('coef.npy')
+        self.intercept = np.asarray(load('intercept.npy'))
+        self.calibration = meta['calibration']
+        if self.calibration == 'isotonic':
+            x, y, offsets = load('iso_x.npy'), load('iso_y.npy'), load('iso_offsets.npy')
+            self.isotonic = [(x[offsets[k]:offsets[k + 1]], y[offsets[k]:offsets[k + 1]]) for k in range(meta['n_folds'])]
+        else:
+            self.sigmoid_ab = np.asarray(load('sigmoid_ab.npy'))
+        self.classes_ = np.array(meta['classes'])
+        self.lowercase = meta['lowercase']
+        self.token_re = re.compile(meta['token_pattern'])
+        self.ngram_range = tuple(meta['ngram_range'])
+        self.norm = meta['norm']
+        self.sublinear_tf = meta['sublinear_tf']
+        self.spacy_normalization = meta.get('spacy_normalization', False)
+
+    def _term_counts(self, doc):
+        """Same analysis as TfidfVectorizer's default word analyzer; returns (column indices, counts)."""
+        if self.lowercase:
+            doc = doc.lower()
+        tokens = self.token_re.findall(doc)
+        counts = {}
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                j = self.vocabulary.get(' '.join(tokens[i:i + n]) if n > 1 else tokens[i])
+                if j is not None:
+                    counts[j] = counts.get(j, 0) + 1
+        return np.fromiter(counts.keys(), dtype=np.int64, count=len(counts)), \
+            np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+
+    def tfidf(self, doc):
+        """(column indices, per-fold normalized TF-IDF weights of shape (n_folds, len(cols)))."""
+        cols, tf = self._term_counts(doc)
+        if self.sublinear_tf:
+            tf = 1.0 + np.log(tf)
+        weights = tf[None, :] * self.idf[:, cols].astype(np.float64)
+        if self.norm == 'l2':
+            norms = np.sqrt((weights * weights).sum(axis=1))
+        elif self.norm == 'l1':
+            norms = np.abs(weights).sum(axis=1)
+        else:
+            norms = np.ones(len(weights))
+        norms[norms == 0] = 1.0
+        return cols, weights / norms[:, None]
+
+    def decision_function(self, docs):
+        """Per-fold logistic regression scores, shape (n_docs, n_folds)."""
+        scores = np.empty((len(docs), len(self.intercept)))
+        for d, doc in enumerate(docs):
+            cols, weights = self.tfidf(doc)
+            scores[d] = (weights * self.coef[:, cols]).sum(axis=1) + self.intercept
+        return scores
+
+    def predict_proba(self, docs):
+        scores = self.decision_function(docs)
+        p1 = np.empty_like(scores)
+        for k in range(scores.shape[1]):
+            if self.calibration == 'isotonic':
+                x, y = self.isotonic[k]
+                p1[:, k] = np.interp(scores[:, k], x, y)
+            else:
+                a, b = self.sigmoid_ab[k]
+                p1[:, k] = 1.0 / (1.0 + np.exp(a * scores[:, k] + b))
+        p1 = np.clip(p1, 0.0, 1.0).mean(axis=1)
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict(self, docs):
+        return self.classes_[self.predict_proba(docs).argmax(axis=1)]
+
+def _compact_meta_path():
+    """meta.json of the compact model, or None when there is none or it predates model.joblib."""
+    meta_path = os.path.join(COMPACT_MODEL_DIR, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    if os.path.exists(MODEL_PATH) and os.path.getmtime(meta_path) < os.path.getmtime(MODEL_PATH):
+        # model.joblib was retrained without a successful export; the compact copy is stale
+        return None
+    return meta_path
+
+def uses_entity_normalization(model):
+    """Whether model was trained on spaCy entity-normalized text (train.py --spacy-normalization)."""
+    return getattr(model, 'spacy_normalization', False)
+
+def load_inference_model():
+    """Model used for predictions: the compact artifact when it is current, else model.joblib."""
+    meta_path = _compact_meta_path()
+    if meta_path is None:
+        return load_model()
+    sig = _file_signature(meta_path)
+    cached = _MODEL_CACHE.get(COMPACT_MODEL_DIR)
+    if cached is None or cached[0] != sig:
+        model = CompactModel(COMPACT_MODEL_DIR)
+        _MODEL_CACHE[COMPACT_MODEL_DIR] = (sig, model)
+        return model
+    return cached[1]
+
+# (path, file signature) -> content digest; hashing runs once per artifact and process
+_VERSION_CACHE = {}
+
+def _content_digest(paths):
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(os.path.basename(path).encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    return h.hexdigest()[:16]
+
+def model_version():
+    """Identifier of the model artifact predict() uses; changes whenever the model is retrained.
+
+    Derived from the artifact's content, not its mtime, so hosts serving copies of the same model
+    agree on it (verdict cache keys shared through Redis depend on that).
+    """
+    path = _compact_meta_path() or MODEL_PATH
+    if not os.path.exists(path):
+        raise FileNotFoundError(f'Model not found at {MODEL_PATH}. Run training first.')
+    key = (path, _file_signature(path))
+    version = _VERSION_CACHE.get(key)
+    if version is None:
+        if path == MODEL_PATH:
+            files = [MODEL_PATH]
+        else:
+            files = sorted(os.path.join(COMPACT_MODEL_DIR, name) for name in os.listdir(COMPACT_MODEL_DIR))
+        version = f'{os.path.basename(path)}-{_content_digest(files)}'
+        _VERSION_CACHE[key] = version
+    return version
+
+def warm_up():
+    """Load the model and the lazily-loaded NLTK resources (WordNet, punkt, POS tagger).
+
+    Called by the production server before forking workers so these live in shared copy-on-write pages.
+    """
+    load_inference_model()
+    wn.ensure_loaded()
+    sample = 'Officials confirmed the report on Monday. Critics disputed the claims.'
+    extract_candidate_claims(sample)
+    predict(sample, use_api=False)
 
 def wordnet_keyword_score(text):
     """Return a simple score based on how many tokens have WordNet synsets (proxy for 'known' keywords)."""
@@ -37,12 +232,14 @@ def wordnet_keyword_score(text):
             hits += 1
     return hits, len(tokens)
 
-def call_factcheck_api(text):
-    # Read API key
-    if not os.path.exists(API_KEY_FILE):
-        return {'error': 'API key file not found', 'ok': False}
-    with open(API_KEY_FILE, 'r', encoding='utf-8') as f:
-        api_key = f.read().strip()
+def call_factcheck_api(text, timeout=FACTCHECK_TIMEOUT):
+    # Read API key (environment takes precedence over the key file)
+    api_key = os.environ.get('FACTCHECK_API_KEY', '').strip()
+    if not api_key:
+        if not os.path.exists(API_KEY_FILE):
+            return {'error': 'API key file not found', 'ok': False}
+        with open(API_KEY_FILE, 'r', encoding='utf-8') as f:
+            api_key = f.read().strip()
     if not api_key:
         return {'error': 'API key file empty', 'ok': False}
 
@@ -53,7 +250,7 @@ def call_factcheck_api(text):
         'languageCode': 'en'
     }
     try:
-        resp = requests.get(FACTCHECK_API_URL, params=params, timeout=10)
+        resp = requests.get(FACTCHECK_API_URL, params=params, timeout=timeout)
         resp.raise_for_status()
         result = resp.json()
         # Extract claim review info if available
@@ -71,14 +268,19 @@ def call_factcheck_api(text):
         return {'ok': False, 'error': str(e)}
 
 
-def check_claims_with_api(text: str, similarity_threshold: float = 0.72, use_semantic_matching: bool = False):
+def check_claims_with_api(text: str, similarity_threshold: float = 0.72, use_semantic_matching: bool = False,
+                          max_claims: int = None, deadline=NO_DEADLINE):
     """Extract candidate claims from text, query API per-claim, optionally with semantic matching.
 
     use_semantic_matching: when True, uses embeddings for better matching (slower, requires transformers).
     When False, uses string-based matching only (fast, no external dependencies).
+    max_claims: query at most this many claims (None = all).
+    deadline: remaining claims are skipped once it expires (result then has 'deadline_exceeded': True).
     Returns a combined api_result similar to call_factcheck_api but aggregated across claims.
     """
     claims = extract_candidate_claims(text)
+    if max_claims is not None:
+        claims = claims[:max_claims]
     if not claims:
         return {'ok': False, 'error': 'no candidate claims found'}
 
@@ -95,8 +297,29 @@ def check_claims_with_api(text: str, similarity_threshold: float = 0.72, use_sem
             # If semantic matching fails, fall back to string-based matching
             st = None
     
+    # Local claim index first; the remote API is only queried on a miss and its answer is stored locally
+    claim_index = get_claim_index()
+    deadline_exceeded = False
     for i, claim in enumerate(claims):
-        api_res = call_factcheck_api(claim)
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            deadline_exceeded = True
+            break
+        local_matches = None
+        if claim_index is not None:
+            try:
+                local_matches = claim_index.search(claim, encoder=_load_st_model if st is not None else None)
+            except Exception:
+                local_matches = None
+        if local_matches:
+            api_res = {'ok': True, 'matched_claims': local_matches, 'source': 'local'}
+        else:
+            api_res = call_factcheck_api(claim, timeout=min(FACTCHECK_TIMEOUT, remaining))
+            if api_res.get('ok') and claim_index is not None:
+                try:
+                    claim_index.add_api_response(api_res.get('raw'))
+                except Exception:
+                    pass
         raw_results.append({'claim': claim, 'api': api_res})
         if not api_res.get('ok'):
             continue
@@ -130,9 +353,7 @@ def check_claims_with_api(text: str, similarity_threshold: float = 0.72, use_sem
             # String-based matching: just add first match
             aggregated_reviews.append(matched[0])
 
-    if not aggregated_reviews:
-        return {'ok': True, 'matched_claims': [], 'raw': raw_results}
-    return {'ok': True, 'matched_claims': aggregated_reviews, 'raw': raw_results}
+    return {'ok': True, 'matched_claims': aggregated_reviews, 'raw': raw_results, 'deadline_exceeded': deadline_exceeded}
 
 
 def interpret_api_verdict(api_result):
@@ -177,22 +398,104 @@ def interpret_api_verdict(api_result):
     confidence = true_votes / total if label == 1 else (total - true_votes) / total
     return label, float(confidence), {'matched_claims': reviews}
 
-def predict(text: str, use_api=False):
-    pipeline = load_model()
-    cleaned = preprocess_text_for_vectorizer(text, enable_spacy_normalization=False)
-    pred = pipeline.predict([cleaned])[0]
-    proba = pipeline.predict_proba([cleaned])[0].tolist() if hasattr(pipeline, 'predict_proba') else None
+def split_into_chunks(text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split text into chunks of whole sentences, each at most max_chars long.
 
-    wn_hits, total = wordnet_keyword_score(text)
+    A single sentence longer than max_chars is cut at whitespace.
+    """
+    chunks = []
+    current = ''
+    for sent in sent_tokenize(text):
+        while len(sent) > max_chars:
+            cut = sent.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if current:
+                chunks.append(current)
+                current = ''
+            chunks.append(sent[:cut])
+            sent = sent[cut:].strip()
+        if current and len(current) + 1 + len(sent) > max_chars:
+            chunks.append(current)
+            current = ''
+        current = f'{current} {sent}' if current else sent
+    if current:
+        chunks.append(current)
+    return chunks
+
+def score_long_text(text: str, model=None, deadline=NO_DEADLINE):
+    """Score a long document chunk by chunk with early exit.
+
+    Chunks are preprocessed and vectorized CHUNK_BATCH_SIZE at a time; the document probability is the
+    length-weighted mean of chunk probabilities. Scoring stops once at least EARLY_EXIT_MIN_CHUNKS chunks
+    give a running verdict with confidence >= EARLY_EXIT_CONFIDENCE, after MAX_CHUNKS chunks, or (after
+    the first batch) when the deadline expires.
+    Returns (probabilities, scored_text, chunk_info).
+    """
+    if model is None:
+        model = load_inference_model()
+    chunks = split_into_chunks(text)
+    weighted = np.zeros(len(model.classes_))
+    total_weight = 0
+    scored = 0
+    early_exit = False
+    deadline_hit = False
+    limit = min(len(chunks), MAX_CHUNKS)
+    while scored < limit:
+        if scored and deadline.expired():
+            deadline_hit = True
+            break
+        batch = chunks[scored:min(scored + CHUNK_BATCH_SIZE, limit)]
+        cleaned = preprocess_texts_for_vectorizer(batch, uses_entity_normalization(model))
+        probs = model.predict_proba(cleaned)
+        lengths = np.array([len(c) for c in batch], dtype=np.float64)
+        weighted += (probs * lengths[:, None]).sum(axis=0)
+        total_weight += lengths.sum()
+        scored += len(batch)
+        if scored >= EARLY_EXIT_MIN_CHUNKS and scored < limit and (weighted / total_weight).max() >= EARLY_EXIT_CONFIDENCE:
+            early_exit = True
+            break
+    proba = weighted / total_weight if total_weight else np.full(len(model.classes_), 1.0 / len(model.classes_))
+    info = {'chunks_total': len(chunks), 'chunks_scored': scored, 'early_exit': early_exit, 'deadline_hit': deadline_hit}
+    return proba, ' '.join(chunks[:scored]), info
+
+def predict(text: str, use_api=False, long_document=None, deadline=NO_DEADLINE):
+    """Classify text; long_document=None picks chunked scoring automatically for texts over LONG_DOC_CHARS.
+
+    deadline bounds chunked scoring and the fact-check stage; the fact-check is skipped (model-only
+    verdict, 'deadline_exceeded': True) when no time is left.
+    """
+    model = load_inference_model()
+    if long_document is None:
+        long_document = len(text) > LONG_DOC_CHARS
+    chunk_info = None
+    if long_document:
+        proba, scored_text, chunk_info = score_long_text(text, model, deadline)
+    else:
+        cleaned = preprocess_text_for_vectorizer(text, uses_entity_normalization(model))
+        proba = model.predict_proba([cleaned])[0]
+        scored_text = text
+    pred = model.classes_[int(proba.argmax())]
+    proba = proba.tolist()
+
+    wn_hits, total = wordnet_keyword_score(scored_text)
 
     api_result = None
     api_label = None
     api_conf = 0.0
     decision_source = 'model'
+    deadline_exceeded = bool(chunk_info and chunk_info['deadline_hit'])
 
-    if use_api:
+    if use_api and deadline.expired():
+        deadline_exceeded = True
+        final_label = int(pred)
+    elif use_api:
         # Use claim-level checking + semantic matching for better recall
-        api_result = check_claims_with_api(text)
+        if long_document:
+            api_result = check_claims_with_api(scored_text, max_claims=LONG_DOC_MAX_CLAIMS, deadline=deadline)
+        else:
+            api_result = check_claims_with_api(text, deadline=deadline)
+        deadline_exceeded = deadline_exceeded or bool(api_result.get('deadline_exceeded'))
         api_label, api_conf, api_details = interpret_api_verdict(api_result)
         # If API produced a clear verdict, prefer it as authoritative
         if api_label is not None:
@@ -215,6 +518,8 @@ def predict(text: str, use_api=False):
         'api_confidence': api_conf,
         'final_label': final_label,
         'decision_source': decision_source,
+        'chunking': chunk_info,
+        'deadline_exceeded': deadline_exceeded,
     }
 
 
@@ -223,59 +528,40 @@ def explain_prediction(text: str, top_n: int = 10):
 
     This helps diagnose why the model labeled a piece of text as fake/true.
     """
-    pipeline = load_model()
-    base = pipeline
-    if hasattr(pipeline, 'estimator'):
-        try:
-            base = pipeline.estimator
-        except Exception:
-            base = pipeline
-    vectorizer = None
-    clf = None
-    if hasattr(base, 'named_steps'):
-        for name, step in base.named_steps.items():
-            if hasattr(step, 'transform') and hasattr(step, 'get_feature_names_out'):
-                vectorizer = step
-            if hasattr(step, 'coef_'):
-                clf = step
+    model = load_inference_model()
+    cleaned = preprocess_text_for_vectorizer(text, uses_entity_normalization(model))
+    if isinstance(model, CompactModel):
+        # fold-averaged terms of the linear score (the ensemble averages the folds' probabilities)
+        cols, weights = model.tfidf(cleaned)
+        tfidf = weights.mean(axis=0)
+        coefs = np.asarray(model.coef[:, cols], dtype=np.float64).mean(axis=0)
+        contrib = (weights * model.coef[:, cols]).mean(axis=0)
+        features = [model.terms[c] for c in cols]
     else:
-        # fallback: assume base is a sequence of steps
-        try:
-            vectorizer, clf = base.steps
-        except Exception:
-            pass
-
-    if vectorizer is None or clf is None:
-        return {'error': 'Could not locate vectorizer and classifier inside the saved pipeline.'}
-
-    cleaned = preprocess_text_for_vectorizer(text, enable_spacy_normalization=False)
-    Xv = vectorizer.transform([cleaned])
-
-    feature_names = vectorizer.get_feature_names_out()
-
-    # For binary logistic regression clf.coef_.shape == (1, n_features)
-    coefs = clf.coef_
-    if coefs.ndim == 2 and coefs.shape[0] == 1:
-        coefs = coefs[0]
-
-    # contribution = tfidf_value * coef
-    try:
-        arr = Xv.toarray()[0]
-    except Exception:
-        arr = Xv.todense().A1
-
-    contrib = arr * coefs
+        vectorizer, clf = _explain_parts(model)
+        if vectorizer is None or clf is None:
+            return {'error': 'Could not locate vectorizer and classifier inside the saved pipeline.'}
+        Xv = vectorizer.transform([cleaned]).tocsr()
+        cols = Xv.indices
+        tfidf = Xv.data
+        # For binary logistic regression clf.coef_.shape == (1, n_features)
+        coefs = np.ravel(clf.coef_[0] if clf.coef_.ndim == 2 else clf.coef_)[cols]
+        # contribution = tfidf_value * coef
+        contrib = tfidf * coefs
+        feature_names = vectorizer.get_feature_names_out()
+        features = [feature_names[c] for c in cols]
 
     # Get top features supporting class 1 (positive contrib) and class 0 (negative contrib)
-    top_pos_idx = contrib.argsort()[::-1][:top_n]
-    top_neg_idx = contrib.argsort()[:top_n]
+    order = contrib.argsort()
+    top_pos_idx = order[::-1][:top_n]
+    top_neg_idx = order[:top_n]
 
     def fmt(indices):
         res = []
         for i in indices:
-            if arr[i] == 0:
+            if tfidf[i] == 0:
                 continue
-            res.append({'feature': feature_names[i], 'tfidf': float(arr[i]), 'coef': float(coefs[i]), 'contrib': float(contrib[i])})
+            res.append({'feature': features[i], 'tfidf': float(tfidf[i]), 'coef': float(coefs[i]), 'contrib': float(contrib[i])})
         return res
 
     return {
@@ -284,14 +570,52 @@ def explain_prediction(text: str, top_n: int = 10):
         'top_negative_features': fmt(top_neg_idx),
     }
 
+def _explain_parts(model):
+    """(vectorizer, classifier) of a model.joblib pipeline; for a calibrated model, those of the first fold."""
+    base = model
+    if hasattr(model, 'calibrated_classifiers_'):
+        # model.estimator is the unfitted template; the fitted pipelines live in the folds
+        fold = model.calibrated_classifiers_[0]
+        base = getattr(fold, 'estimator', None) or fold.base_estimator
+    vectorizer = None
+    clf = None
+    if hasattr(base, 'named_steps'):
+        for name, step in base.named_steps.items():
+            if hasattr(step, 'transform') and hasattr(step, 'get_feature_names_out'):
+                vectorizer = step
+            if hasattr(step, 'coef_'):
+                clf = step
+    return vectorizer, clf
+
 if __name__ == '__main__':
     import argparse
     parser = argparse.ArgumentParser()
-    parser.add_argument('text', help='Text to classify')
+    parser.add_argument('text', nargs='?', help='Text to classify')
     parser.add_argument('--api', action='store_true', help='Call external fact-check API (requires Api key.txt and valid URL)')
     parser.add_argument('--explain', action='store_true', help='Show top contributing features for the prediction')
+    bulk = parser.add_argument_group('bulk scoring', 'Stream records from a file instead of classifying one text')
+    bulk.add_argument('--bulk', metavar='INPUT', help='JSONL or CSV file to score ("-" for stdin)')
+    bulk.add_argument('--output', help='Output .jsonl file, or .parquet directory of part files')
+    bulk.add_argument('--input-format', choices=['jsonl', 'csv'], help='Default: from the INPUT extension (stdin: jsonl)')
+    bulk.add_argument('--output-format', choices=['jsonl', 'parquet'], help='Default: from the --output extension')
+    bulk.add_argument('--text-field', default='text')
+    bulk.add_argument('--id-field', default='id', help='Record id field (missing ids fall back to the record index)')
+    bulk.add_argument('--title-field', default='title', help='Optional title field prepended to the text')
+    bulk.add_argument('--batch-size', type=int, default=256)
+    bulk.add_argument('--workers', type=int, help='Scoring processes (default: CPU count)')
+    bulk.add_argument('--resume', action='store_true', help='Continue from the checkpoint of an interrupted run')
     args = parser.parse_args()
-    if args.explain:
+    if args.bulk:
+        if not args.output:
+            parser.error('--bulk requires --output')
+        from bulk_score import run_bulk
+        n = run_bulk(args.bulk, args.output, input_format=args.input_format, output_format=args.output_format,
+                     text_field=args.text_field, id_field=args.id_field, title_field=args.title_field,
+                     batch_size=args.batch_size, workers=args.workers, resume=args.resume)
+        print(f'Scored {n} records into {args.output}')
+    elif not args.text:
+        parser.error('text is required unless --bulk is given')
+    elif args.explain:
         expl = explain_prediction(args.text, top_n=12)
         print('Explanation:')
         if 'error' in expl:
@@ -1,27 +1,31 @@
 import re
+import logging
 import nltk
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 import importlib
+from model_manager import MANAGER as MODEL_MANAGER
 
-# Optional spaCy for entity normalization (lazy-loaded)
-_SPACY = None
+logger = logging.getLogger(__name__)
 
-def _get_spacy():
-    global _SPACY
-    if _SPACY is None:
+# Optional spaCy for entity normalization (lazy-loaded, evicted again when idle, see model_manager)
+def _create_spacy():
+    try:
+        import spacy
         try:
-            import spacy
-            try:
-                _SPACY = spacy.load('en_core_web_sm')
-            except Exception:
-                # try to download small model
-                from spacy.cli import download as spacy_download
-                spacy_download('en_core_web_sm')
-                _SPACY = spacy.load('en_core_web_sm')
+            return spacy.load('en_core_web_sm')
         except Exception:
-            _SPACY = None
-    return _SPACY
+            # try to download small model
+            from spacy.cli import download as spacy_download
+            spacy_download('en_core_web_sm')
+            return spacy.load('en_core_web_sm')
+    except Exception:
+        return None
+
+MODEL_MANAGER.register('spacy', _create_spacy)
+
+def _get_spacy():
+    return MODEL_MANAGER.get('spacy')
 
 # Ensure required NLTK data is available (will download if missing)
 def ensure_nltk():
@@ -70,39 +74,87 @@ def tokenize_and_lemmatize(text: str):
         lemmas.append(lemmatizer.lemmatize(token, wn_pos))
     return lemmas
 
+# spaCy components not needed for entity recognition; skipped when normalizing entities
+_SPACY_UNUSED_PIPES = ('tagger', 'parser', 'attribute_ruler', 'lemmatizer', 'senter', 'morphologizer')
+
+def replace_entity_spans(text: str, spans) -> str:
+    """Replace sorted (start_char, end_char, label) spans with __LABEL__ tokens in a single pass.
+
+    Overlapping spans (spaCy's doc.ents never overlap) keep the first one.
+    """
+    parts = []
+    pos = 0
+    for start, end, label in spans:
+        if start < pos:
+            continue
+        parts.append(text[pos:start])
+        parts.append(f"__{label}__")
+        pos = end
+    parts.append(text[pos:])
+    return ''.join(parts)
+
+def _entity_spans(doc):
+    return [(ent.start_char, ent.end_char, ent.label_) for ent in doc.ents]
+
+def normalize_entities_batch(texts, batch_size: int = 256, n_process: int = 1):
+    """Replace named entities with entity-label tokens for many texts at once.
+
+    Streams texts through spaCy's nlp.pipe with the components NER does not need disabled.
+    n_process > 1 uses several worker processes. Returns texts unchanged if spaCy is unavailable;
+    a text spaCy cannot process (e.g. longer than nlp.max_length) is kept unchanged on its own.
+    """
+    texts = list(texts)
+    spacy_model = _get_spacy()
+    if spacy_model is None:
+        logger.warning('spaCy is unavailable; %d texts left without entity normalization', len(texts))
+        return texts
+    disable = [name for name in spacy_model.pipe_names if name in _SPACY_UNUSED_PIPES]
+    out = list(texts)
+    todo = [i for i, t in enumerate(texts) if len(t) <= spacy_model.max_length]
+    failed = len(texts) - len(todo)
+    done = 0
+    try:
+        docs = spacy_model.pipe((texts[i] for i in todo), batch_size=batch_size, n_process=n_process, disable=disable)
+        for i, doc in zip(todo, docs):
+            out[i] = replace_entity_spans(doc.text, _entity_spans(doc))
+            done += 1
+    except Exception as e:
+        logger.warning('spaCy batch failed after %d texts (%s); normalizing the rest one by one', done, e)
+        for i in todo[done:]:
+            try:
+                out[i] = replace_entity_spans(texts[i], _entity_spans(spacy_model(texts[i], disable=disable)))
+            except Exception:
+                failed += 1
+    if failed:
+        logger.warning('Entity normalization skipped for %d of %d texts', failed, len(texts))
+    return out
+
+def _clean_and_lemmatize(text: str) -> str:
+    cleaned = clean_text(text)
+    lemmas = tokenize_and_lemmatize(cleaned)
+    return " ".join(lemmas)
+
 def preprocess_text_for_vectorizer(text: str, enable_spacy_normalization: bool = False) -> str:
     """Return a cleaned string suitable for TF-IDF vectorizer (joined lemmas).
 
     enable_spacy_normalization: when True, replace named entities with entity-label tokens using spaCy.
-    This can be slow over large datasets; default is False to keep training fast.
+    This can be slow over large datasets; use preprocess_texts_for_vectorizer to batch them.
     """
     # Optional entity normalization
     if enable_spacy_normalization:
         try:
             spacy_model = _get_spacy()
             if spacy_model is not None:
-                doc = spacy_model(text)
-                ent_map = {}
-                for ent in doc.ents:
-                    ent_map[(ent.start_char, ent.end_char)] = f"__{ent.label_}__"
-                if ent_map:
-                    i = 0
-                    out = ''
-                    while i < len(text):
-                        replaced = False
-                        for (s, e), token in ent_map.items():
-                            if i == s:
-                                out += token
-                                i = e
-                                replaced = True
-                                break
-                        if not replaced:
-                            out += text[i]
-                            i += 1
-                    text = out
+                text = replace_entity_spans(text, _entity_spans(spacy_model(text)))
         except Exception:
             pass
 
-    cleaned = clean_text(text)
-    lemmas = tokenize_and_lemmatize(cleaned)
-    return " ".join(lemmas)
+    return _clean_and_lemmatize(text)
+
+def preprocess_texts_for_vectorizer(texts, enable_spacy_normalization: bool = False,
+                                    batch_size: int = 256, n_process: int = 1):
+    """Batched preprocess_text_for_vectorizer; entity normalization runs through spaCy in batches."""
+    texts = list(texts)
+    if enable_spacy_normalization:
+        texts = normalize_entities_batch(texts, batch_size=batch_size, n_process=n_process)
+    return [_clean_and_lemmatize(t) for t in texts]
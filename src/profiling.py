@@ -0,0 +1,161 @@
+"""
+On-demand profiling of single API requests.
+
+A request is profiled when it sends `X-Profile: cprofile` or `X-Profile: sample` (only if
+PROFILE_ALLOW_HEADER=1), or when it is picked by PROFILE_SAMPLE_RATE (fraction of requests,
+profiled in PROFILE_SAMPLE_MODE). Two profilers are available:
+  - cprofile: deterministic (cProfile); exact call counts, noticeable overhead.
+    Writes <PROFILE_DIR>/<request id>.prof (open with pstats or snakeviz).
+  - sample:   a background thread samples the request thread's stack every
+    PROFILE_SAMPLE_INTERVAL_MS; low overhead. Writes <request id>.folded (collapsed stacks,
+    the input format of flamegraph.pl / speedscope).
+The top functions by self time are returned in the response's 'debug' field. When a request
+is not profiled the only cost is a header lookup and a random draw.
+
+Only one request per process is profiled at a time; others run unprofiled.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(os.path.dirname(__file__), '..', 'profiles'))
+PROFILE_ALLOW_HEADER = os.environ.get('PROFILE_ALLOW_HEADER', '0') == '1'
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SAMPLE_MODE = os.environ.get('PROFILE_SAMPLE_MODE', 'sample')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5))
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', 15))
+
+MODES = ('cprofile', 'sample')
+
+logger = logging.getLogger(__name__)
+
+# cProfile cannot run in two threads at once on Python 3.12+, and one profile at a time keeps overhead bounded
+_ACTIVE = threading.Lock()
+
+
+def choose_mode(header_value):
+    """Profiling mode for a request, or None when it should not be profiled."""
+    if header_value and PROFILE_ALLOW_HEADER:
+        value = header_value.strip().lower()
+        return value if value in MODES else 'cprofile'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return PROFILE_SAMPLE_MODE
+    return None
+
+
+def _label(filename, lineno, funcname):
+    return f'{funcname} ({os.path.basename(filename)}:{lineno})'
+
+
+class CProfileSession:
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def abort(self):
+        self.profiler.disable()
+
+    def stop(self, path_base):
+        self.profiler.disable()
+        path = path_base + '.prof'
+        self.profiler.dump_stats(path)
+        stats = pstats.Stats(self.profiler).stats
+        rows = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:PROFILE_TOP_N]
+        top = [{'function': _label(*key), 'calls': nc, 'self_ms': round(tt * 1000, 2), 'cumulative_ms': round(ct * 1000, 2)}
+               for key, (cc, nc, tt, ct, _) in rows]
+        return path, top
+
+
+class SamplingSession:
+    """Samples one thread's stack from a background thread via sys._current_frames()."""
+
+    def __init__(self, thread_id=None, interval_s=PROFILE_SAMPLE_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(_label(code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+            self.samples += 1
+
+    def abort(self):
+        self._stop.set()
+        self._thread.join()
+
+    def stop(self, path_base):
+        self.abort()
+        path = path_base + '.folded'
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.items():
+                f.write(';'.join(s.replace(';', ',') for s in stack) + f' {count}\n')
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            self_counts[stack[-1]] += count
+            for fn in set(stack):
+                total_counts[fn] += count
+        ms_per_sample = self.interval_s * 1000
+        top = [{'function': fn, 'samples': n, 'self_ms': round(n * ms_per_sample, 1),
+                'cumulative_ms': round(total_counts[fn] * ms_per_sample, 1)}
+               for fn, n in self_counts.most_common(PROFILE_TOP_N)]
+        return path, top
+
+
+def start(mode):
+    """Start profiling the current thread; returns a session, or None if another request is being profiled."""
+    if not _ACTIVE.acquire(blocking=False):
+        return None
+    try:
+        session = CProfileSession() if mode == 'cprofile' else SamplingSession()
+    except Exception:
+        _ACTIVE.release()
+        raise
+    session.mode = mode
+    session.started = time.perf_counter()
+    return session
+
+
+def finish(session, request_id):
+    """Stop the session, write the profile file and return the debug summary.
+
+    Never raises: if the profile cannot be written (e.g. PROFILE_DIR unwritable or the disk
+    full), a warning is logged and the summary has no 'profile_file'.
+    """
+    summary = {
+        'request_id': request_id,
+        'mode': session.mode,
+        'wall_ms': round((time.perf_counter() - session.started) * 1000, 1),
+    }
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe_id = ''.join(c for c in request_id if c.isalnum() or c in '-_')[:64] or 'request'
+        path, top = session.stop(os.path.join(PROFILE_DIR, safe_id))
+        summary['profile_file'] = os.path.abspath(path)
+        summary['top_functions'] = top
+    except Exception as e:
+        logger.warning('Profiling: could not write the profile of request %s (%s)', request_id, e)
+        summary['error'] = str(e)
+        session.abort()
+    finally:
+        _ACTIVE.release()
+    return summary
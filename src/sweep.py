@@ -0,0 +1,207 @@
+"""
+Hyperparameter sweep for the TF-IDF + logistic regression model.
+
+The corpus is preprocessed once, and the vectorized train/test matrices are cached on
+disk per vectorizer config (under .sweep_cache/, keyed by the dataset file and the
+config), so re-running a sweep or adding classifier settings skips both steps.
+Classifier x calibration combinations are then fitted in parallel across cores.
+
+The output is a ranked table of accuracy, log-loss, training time and serving cost. Serving
+cost is measured on what would be deployed: each config is exported as a compact model
+(train.export_compact_model), and artifact_mb is its size on disk; latency_ms is the median
+time to preprocess and score one raw test document with it.
+
+Unlike train.py, which refits the vectorizer inside every calibration fold, the sweep
+fits one vectorizer on the training split and reuses it for every fold, so absolute
+numbers can differ slightly from a full train.py run. Retrain the chosen config with
+train.py (e.g. `python src/train.py --max-features 10000 --C 1 --calibration sigmoid`).
+
+Example:
+    python src/sweep.py --max-features 2000,5000,10000 --ngram-max 1,2 --C 0.1,0.5,1,2 --n-jobs -1
+"""
+
+import argparse
+import contextlib
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import time
+from types import SimpleNamespace
+
+import joblib
+from joblib import Parallel, delayed
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, log_loss
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import make_pipeline
+
+from preprocess import preprocess_text_for_vectorizer
+from train import DATA_PATH, load_dataset, prepare_X, export_compact_model
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), '..', '.sweep_cache')
+LATENCY_DOCS = 50
+
+
+def _cache_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _dataset_signature(path):
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_mtime_ns, st.st_size]
+
+
+def load_split(data_path=DATA_PATH):
+    """Preprocessed train/test split (same split as train.py) plus raw sample test docs, cached on disk."""
+    path = os.path.join(CACHE_DIR, f'split-v2-{_cache_key(_dataset_signature(data_path))}.joblib')
+    if os.path.exists(path):
+        return joblib.load(path)
+    print('Preprocessing corpus (cached for later runs)...')
+    df = load_dataset(data_path)
+    X = prepare_X(df, enable_spacy_normalization=False)
+    y = df['label'].values
+    raw = df['text'].tolist()
+    X_train, X_test, _, raw_test, y_train, y_test = train_test_split(X, raw, y, test_size=0.2, random_state=42, stratify=y)
+    split = (X_train, X_test, y_train, y_test, raw_test[:LATENCY_DOCS])
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    joblib.dump(split, path)
+    return split
+
+
+def vectorized_matrices(split, vect_config, data_path=DATA_PATH):
+    """Path of the cached (vectorizer, X_train, X_test, y_train, y_test, raw sample docs) for a vectorizer config."""
+    path = os.path.join(CACHE_DIR, f'tfidf-v2-{_cache_key(_dataset_signature(data_path), vect_config)}.joblib')
+    if not os.path.exists(path):
+        X_train, X_test, y_train, y_test, sample_docs = split
+        vectorizer = TfidfVectorizer(max_features=vect_config['max_features'],
+                                     ngram_range=(1, vect_config['ngram_max']), min_df=2, max_df=0.8)
+        Xtr = vectorizer.fit_transform(X_train)
+        Xte = vectorizer.transform(X_test)
+        joblib.dump((vectorizer, Xtr, Xte, y_train, y_test, sample_docs), path)
+    return path
+
+
+def evaluate(matrices_path, vect_config, C, calibration, cv):
+    """Fit one classifier config on cached matrices and measure quality and serving cost."""
+    # mmap: parallel workers share the cached matrices instead of each holding a copy
+    vectorizer, Xtr, Xte, y_train, y_test, sample_docs = joblib.load(matrices_path, mmap_mode='r')
+    clf = LogisticRegression(max_iter=1000, class_weight='balanced', C=C, solver='lbfgs')
+    model = CalibratedClassifierCV(estimator=clf, cv=cv, method=calibration)
+
+    start = time.perf_counter()
+    model.fit(Xtr, y_train)
+    train_time = time.perf_counter() - start
+
+    probas = model.predict_proba(Xte)
+    preds = model.classes_[probas.argmax(axis=1)]
+
+    artifact_mb, latencies = _serving_cost(vectorizer, model, sample_docs)
+
+    return {
+        **vect_config,
+        'C': C,
+        'calibration': calibration,
+        'accuracy': accuracy_score(y_test, preds),
+        'log_loss': log_loss(y_test, probas, labels=model.classes_),
+        'train_s': train_time,
+        'artifact_mb': artifact_mb,
+        'latency_ms': statistics.median(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def _serving_cost(vectorizer, model, sample_docs):
+    """(size in MB, per-doc latencies) of the compact model exported from a fitted config."""
+    from predict import CompactModel
+    # export_compact_model reads (vectorizer + classifier) pipelines per fold, as train.py fits them
+    folds = [SimpleNamespace(estimator=make_pipeline(vectorizer, _fold_estimator(cc)), calibrators=cc.calibrators)
+             for cc in model.calibrated_classifiers_]
+    calibrated = SimpleNamespace(calibrated_classifiers_=folds, classes_=model.classes_)
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = os.path.join(tmp, 'model_compact')
+        with contextlib.redirect_stdout(io.StringIO()):
+            export_compact_model(calibrated, out_dir)
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        compact = CompactModel(out_dir, mmap_mode=None)
+    latencies = []
+    for doc in sample_docs:
+        t0 = time.perf_counter()
+        compact.predict_proba([preprocess_text_for_vectorizer(doc, enable_spacy_normalization=False)])
+        latencies.append(time.perf_counter() - t0)
+    return size / 1e6, latencies
+
+
+def _fold_estimator(calibrated_classifier):
+    # sklearn >= 1.2 names the fitted estimator `estimator`, older versions `base_estimator`
+    estimator = getattr(calibrated_classifier, 'estimator', None)
+    return estimator if estimator is not None else calibrated_classifier.base_estimator
+
+
+def run_sweep(max_features, ngram_max, Cs, calibrations, cv=5, n_jobs=-1, data_path=DATA_PATH):
+    split = load_split(data_path)
+    vect_configs = [{'max_features': mf, 'ngram_max': n} for mf, n in itertools.product(max_features, ngram_max)]
+    paths = {}
+    for vc in vect_configs:
+        print(f'Vectorizing: {vc}')
+        paths[json.dumps(vc, sort_keys=True)] = vectorized_matrices(split, vc, data_path)
+
+    jobs = [(vc, C, cal) for vc in vect_configs for C in Cs for cal in calibrations]
+    print(f'Evaluating {len(jobs)} configurations...')
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate)(paths[json.dumps(vc, sort_keys=True)], vc, C, cal, cv) for vc, C, cal in jobs
+    )
+    return sorted(results, key=lambda r: (-r['accuracy'], r['log_loss']))
+
+
+COLUMNS = ['max_features', 'ngram_max', 'C', 'calibration', 'accuracy', 'log_loss', 'train_s', 'artifact_mb', 'latency_ms']
+
+
+def print_table(results):
+    print(f"\n{'rank':>4} {'max_feat':>8} {'ngram':>5} {'C':>6} {'calibration':>11} {'accuracy':>8} "
+          f"{'log_loss':>8} {'train_s':>8} {'size_mb':>8} {'lat_ms':>7}")
+    for rank, r in enumerate(results, 1):
+        print(f"{rank:4d} {r['max_features']:8d} {'1-' + str(r['ngram_max']):>5} {r['C']:6g} {r['calibration']:>11} "
+              f"{r['accuracy']:8.4f} {r['log_loss']:8.4f} {r['train_s']:8.2f} {r['artifact_mb']:8.2f} {r['latency_ms']:7.2f}")
+
+
+def _list(cast):
+    return lambda value: [cast(v) for v in value.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep vectorizer/classifier/calibration settings over cached features')
+    parser.add_argument('--data', default=DATA_PATH, help='Dataset CSV (default: data/dataset.csv)')
+    parser.add_argument('--max-features', type=_list(int), default=[2000, 5000, 10000])
+    parser.add_argument('--ngram-max', type=_list(int), default=[1, 2])
+    parser.add_argument('--C', type=_list(float), default=[0.1, 0.5, 1.0, 2.0])
+    parser.add_argument('--calibration', type=_list(str), default=['isotonic', 'sigmoid'],
+                        help='Calibration methods (the ones train.py --calibration supports)')
+    parser.add_argument('--cv', type=int, default=5, help='Calibration folds')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Parallel workers (-1 = all cores)')
+    parser.add_argument('--csv', help='Also write the ranked table to this CSV file')
+    args = parser.parse_args()
+
+    for cal in args.calibration:
+        if cal not in ('isotonic', 'sigmoid'):
+            parser.error(f'unknown calibration: {cal}')
+
+    results = run_sweep(args.max_features, args.ngram_max, args.C, args.calibration,
+                        cv=args.cv, n_jobs=args.n_jobs, data_path=args.data)
+    print_table(results)
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for r in results:
+                writer.writerow({k: r[k] for k in COLUMNS})
+        print(f'\nWrote {args.csv}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,7 @@
 import os
+import json
+import shutil
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -7,11 +10,12 @@ from sklearn.pipeline import make_pipeline
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.calibration import CalibratedClassifierCV
 import joblib
-from preprocess import preprocess_text_for_vectorizer
+from preprocess import preprocess_texts_for_vectorizer
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'dataset.csv')
 MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model.joblib')
 VECT_PATH = os.path.join(os.path.dirname(__file__), '..', 'vectorizer.joblib')
+COMPACT_MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'model_compact')
 
 def load_dataset(path=DATA_PATH):
     df = pd.read_csv(path)
@@ -26,28 +30,38 @@ def load_dataset(path=DATA_PATH):
         df['text'] = df['combined_text']
     return df
 
-def prepare_X(df: pd.DataFrame, enable_spacy_normalization: bool = False):
-    return df['text'].apply(lambda t: preprocess_text_for_vectorizer(t, enable_spacy_normalization)).tolist()
+def prepare_X(df: pd.DataFrame, enable_spacy_normalization: bool = False, n_process: int = 1):
+    return preprocess_texts_for_vectorizer(df['text'].tolist(), enable_spacy_normalization, n_process=n_process)
 
-def train_and_save():
+def load_train_test_split(spacy_normalization=False, n_process=1):
+    """Preprocessed (X_train, X_test, y_train, y_test); the split is fixed, so --export-only can verify on it."""
     df = load_dataset()
-    X = prepare_X(df, enable_spacy_normalization=False)
+    X = prepare_X(df, enable_spacy_normalization=spacy_normalization, n_process=n_process)
     y = df['label'].values
-
     # Use stratified split with more validation data for better calibration
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+def train_and_save(max_features=5000, ngram_range=(1, 2), C=0.5, calibration='isotonic',
+                   spacy_normalization=False, n_process=1):
+    """Train, evaluate and save the model. Defaults are the tuned values; see sweep.py to compare others.
+
+    spacy_normalization replaces named entities with entity-label tokens (spaCy, n_process worker
+    processes); the saved model records it so predict.py normalizes its input the same way.
+    """
+    X_train, X_test, y_train, y_test = load_train_test_split(spacy_normalization, n_process)
 
     # TF-IDF + Logistic Regression pipeline with adjusted hyperparameters
-    vectorizer = TfidfVectorizer(max_features=5000, ngram_range=(1,2), min_df=2, max_df=0.8)
+    vectorizer = TfidfVectorizer(max_features=max_features, ngram_range=tuple(ngram_range), min_df=2, max_df=0.8)
     # Use lower C value for less aggressive regularization, allowing model to adapt better
-    clf = LogisticRegression(max_iter=1000, class_weight='balanced', C=0.5, solver='lbfgs')
+    clf = LogisticRegression(max_iter=1000, class_weight='balanced', C=C, solver='lbfgs')
 
     pipeline = make_pipeline(vectorizer, clf)
 
     # Wrap pipeline in a calibrated classifier with cross-validation for better probability estimates
     # Using isotonic regression for more flexible probability calibration
-    calibrated = CalibratedClassifierCV(estimator=pipeline, cv=5, method='isotonic')
+    calibrated = CalibratedClassifierCV(estimator=pipeline, cv=5, method=calibration)
     calibrated.fit(X_train, y_train)
+    calibrated.spacy_normalization = spacy_normalization
 
     # Evaluate (use calibrated predictions)
     preds = calibrated.predict(X_test)
@@ -66,5 +80,163 @@ def train_and_save():
     print(f'Saved raw pipeline to {RAW_PIPELINE_PATH}')
     print(f'Saved calibrated pipeline to {MODEL_PATH}')
 
+    try:
+        export_compact_model(calibrated, X_verify=X_test)
+    except Exception:
+        # never leave the previous model's compact copy in front of the new model.joblib
+        remove_compact_model()
+        raise
+
+def remove_compact_model(out_dir=COMPACT_MODEL_DIR):
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+        print(f'Removed stale compact model {out_dir}; predictions use {MODEL_PATH}')
+
+def _fold_parts(calibrated_classifier):
+    """Return (vectorizer, classifier, calibrator) of one fitted _CalibratedClassifier."""
+    # sklearn >= 1.2 names the fitted pipeline `estimator`, older versions `base_estimator`
+    pipeline = getattr(calibrated_classifier, 'estimator', None)
+    if pipeline is None:
+        pipeline = calibrated_classifier.base_estimator
+    return pipeline.steps[0][1], pipeline.steps[-1][1], calibrated_classifier.calibrators[0]
+
+def export_compact_model(calibrated, out_dir=COMPACT_MODEL_DIR, X_verify=None):
+    """Write an inference-only copy of the calibrated model as plain .npy arrays (loadable with mmap).
+
+    When X_verify is given, the copy must reproduce calibrated.predict_proba on it
+    (see verify_compact_model) before it replaces the current one.
+
+    Layout (K = number of CV folds, V = size of the merged vocabulary):
+      meta.json          analyzer settings, classes, calibration method
+      vocab.txt          one term per line; line number = column index
+      idf.npy            float32 (K, V), 0 where a term is not in that fold's vocabulary
+      coef.npy           float32 (K, V), logistic regression coefficients
+      intercept.npy      float64 (K,)
+      iso_x.npy/iso_y.npy/iso_offsets.npy   isotonic thresholds of all folds, concatenated
+        (or sigmoid_ab.npy, float64 (K, 2), for sigmoid calibration)
+    The per-fold vectorizers' stop_words_ sets are not needed for inference and are dropped.
+    """
+    from sklearn.isotonic import IsotonicRegression
+
+    folds = [_fold_parts(cc) for cc in calibrated.calibrated_classifiers_]
+    ref = folds[0][0]
+    for vect, clf, _ in folds:
+        if vect.get_params() != ref.get_params():
+            raise ValueError('All folds must share the same vectorizer settings')
+        if vect.analyzer != 'word' or vect.tokenizer is not None or vect.preprocessor is not None:
+            raise ValueError('Only the default word analyzer can be exported')
+        # CompactModel only implements lowercasing, token_pattern, n-grams, sublinear_tf and norm
+        if vect.stop_words is not None or vect.strip_accents is not None or vect.binary \
+                or np.dtype(vect.dtype) != np.float64:
+            raise ValueError('Vectorizers with stop_words, strip_accents, binary or a custom dtype cannot be exported')
+        if clf.coef_.shape[0] != 1:
+            raise ValueError('Only binary classifiers can be exported')
+
+    terms = sorted(set().union(*(vect.vocabulary_ for vect, _, _ in folds)))
+    index = {t: i for i, t in enumerate(terms)}
+    n_folds, n_terms = len(folds), len(terms)
+
+    idf = np.zeros((n_folds, n_terms), dtype=np.float32)
+    coef = np.zeros((n_folds, n_terms), dtype=np.float32)
+    intercept = np.zeros(n_folds, dtype=np.float64)
+    calibration = 'isotonic' if isinstance(folds[0][2], IsotonicRegression) else 'sigmoid'
+    iso_x, iso_y, iso_offsets, sigmoid_ab = [], [], [0], []
+    for k, (vect, clf, calibrator) in enumerate(folds):
+        cols = np.empty(len(vect.vocabulary_), dtype=np.int64)
+        for term, j in vect.vocabulary_.items():
+            cols[j] = index[term]
+        idf[k, cols] = vect.idf_ if vect.use_idf else 1.0
+        coef[k, cols] = clf.coef_[0]
+        intercept[k] = clf.intercept_[0]
+        if calibration == 'isotonic':
+            iso_x.append(calibrator.X_thresholds_)
+            iso_y.append(calibrator.y_thresholds_)
+            iso_offsets.append(iso_offsets[-1] + len(calibrator.X_thresholds_))
+        else:
+            sigmoid_ab.append((calibrator.a_, calibrator.b_))
+
+    meta = {
+        'format_version': 1,
+        'classes': [int(c) for c in calibrated.classes_],
+        'n_folds': n_folds,
+        'calibration': calibration,
+        'lowercase': ref.lowercase,
+        'token_pattern': ref.token_pattern,
+        'ngram_range': list(ref.ngram_range),
+        'norm': ref.norm,
+        'sublinear_tf': ref.sublinear_tf,
+        'spacy_normalization': getattr(calibrated, 'spacy_normalization', False),
+    }
+
+    # Write into a temp dir and swap it in, so a running server never sees a half-written model
+    tmp_dir = out_dir.rstrip(os.sep) + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    with open(os.path.join(tmp_dir, 'vocab.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(terms))
+    np.save(os.path.join(tmp_dir, 'idf.npy'), idf)
+    np.save(os.path.join(tmp_dir, 'coef.npy'), coef)
+    np.save(os.path.join(tmp_dir, 'intercept.npy'), intercept)
+    if calibration == 'isotonic':
+        np.save(os.path.join(tmp_dir, 'iso_x.npy'), np.concatenate(iso_x).astype(np.float64))
+        np.save(os.path.join(tmp_dir, 'iso_y.npy'), np.concatenate(iso_y).astype(np.float64))
+        np.save(os.path.join(tmp_dir, 'iso_offsets.npy'), np.array(iso_offsets, dtype=np.int64))
+    else:
+        np.save(os.path.join(tmp_dir, 'sigmoid_ab.npy'), np.array(sigmoid_ab, dtype=np.float64))
+    # meta.json is written last; its mtime is the artifact's version
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    if X_verify is not None:
+        try:
+            verify_compact_model(calibrated, X_verify, tmp_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    old_dir = out_dir.rstrip(os.sep) + '.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+    print(f'Saved compact inference model to {out_dir} ({size / 1e6:.1f} MB, {n_folds} folds, {n_terms} terms)')
+
+def verify_compact_model(calibrated, X_sample, out_dir=COMPACT_MODEL_DIR, atol=1e-4):
+    """Check that the compact model reproduces the calibrated model's probabilities."""
+    from predict import CompactModel
+    compact = CompactModel(out_dir)
+    expected = calibrated.predict_proba(X_sample)
+    got = compact.predict_proba(X_sample)
+    max_diff = float(np.abs(expected - got).max()) if len(X_sample) else 0.0
+    print(f'Compact model max |proba diff| over {len(X_sample)} docs: {max_diff:.2e}')
+    if max_diff > atol:
+        raise ValueError(f'Compact model diverges from the calibrated model (max diff {max_diff:.2e} > {atol})')
+    return max_diff
+
 if __name__ == '__main__':
-    train_and_save()
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--export-only', action='store_true', help='Export the compact inference model from an existing model.joblib')
+    parser.add_argument('--max-features', type=int, default=5000)
+    parser.add_argument('--ngram-max', type=int, default=2, help='Use word n-grams of length 1..N')
+    parser.add_argument('--C', type=float, default=0.5, help='Inverse regularization strength')
+    parser.add_argument('--calibration', choices=['isotonic', 'sigmoid'], default='isotonic')
+    parser.add_argument('--spacy-normalization', action='store_true',
+                        help='Replace named entities with entity-label tokens (needs spaCy; applied at prediction time too)')
+    parser.add_argument('--spacy-processes', type=int, default=1, help='spaCy worker processes for --spacy-normalization')
+    args = parser.parse_args()
+    if args.export_only:
+        try:
+            calibrated = joblib.load(MODEL_PATH)
+            _, X_test, _, _ = load_train_test_split(getattr(calibrated, 'spacy_normalization', False),
+                                                    args.spacy_processes)
+            export_compact_model(calibrated, X_verify=X_test)
+        except Exception:
+            remove_compact_model()
+            raise
+    else:
+        train_and_save(max_features=args.max_features, ngram_range=(1, args.ngram_max), C=args.C,
+                       calibration=args.calibration, spacy_normalization=args.spacy_normalization,
+                       n_process=args.spacy_processes)
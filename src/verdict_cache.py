@@ -0,0 +1,155 @@
+"""
+Exact-match cache for /api/predict and /api/url responses.
+
+Keys combine the endpoint, the model version (a hash of the model artifact's content,
+see predict.model_version) and either a hash of the normalized text or the canonical URL,
+so a retrained model never serves stale verdicts and hosts running the same model agree. Entries live in
+an in-process LRU with a TTL; when VERDICT_CACHE_REDIS_URL is set they are also written
+to Redis (requires `pip install redis`) so every worker and host shares them. Configure
+the Redis server with an LRU maxmemory-policy to bound its size.
+
+Settings (environment): VERDICT_CACHE_SIZE (entries, default 10000; 0 disables the cache),
+VERDICT_CACHE_TTL (seconds, default 3600), VERDICT_CACHE_REDIS_URL.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that do not change the article
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ref', 'ref_src', 'cmpid'}
+
+
+def normalize_text(text):
+    """Unicode-normalize and collapse whitespace; the model is insensitive to these differences."""
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def canonical_url(url):
+    """Canonical form of an article URL: lowercase host without www., no fragment, default port,
+    tracking parameters or trailing slash, and sorted query parameters."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and not ((scheme == 'http' and parts.port == 80) or (scheme == 'https' and parts.port == 443)):
+        host = f'{host}:{parts.port}'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith('utm_') and k.lower() not in TRACKING_PARAMS)
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def text_digest(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def text_key(endpoint, text, model_version):
+    return f'{endpoint}:{model_version}:{text_digest(text)}'
+
+
+def url_key(endpoint, url, model_version):
+    digest = hashlib.sha256(canonical_url(url).encode('utf-8')).hexdigest()
+    return f'{endpoint}:{model_version}:{digest}'
+
+
+class VerdictCache:
+    """In-process LRU + TTL cache of JSON-serializable response payloads, optionally backed by Redis."""
+
+    def __init__(self, max_entries=10000, ttl=3600, redis_url=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, payload)
+        self._lock = threading.Lock()
+        self._model_version = None
+        self.hits = 0
+        self.misses = 0
+        self._redis = None
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url)
+            except Exception as e:
+                logger.warning('Verdict cache: Redis backend unavailable (%s), using in-process cache only', e)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def check_model_version(self, model_version):
+        """Drop local entries when the model changes (their keys can no longer match anyway)."""
+        with self._lock:
+            if self._model_version != model_version:
+                if self._model_version is not None:
+                    logger.info('Verdict cache: model version changed, clearing %d entries', len(self._entries))
+                self._entries.clear()
+                self._model_version = model_version
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+        if self._redis is not None:
+            try:
+                raw = self._redis.get(key)
+            except Exception as e:
+                logger.warning('Verdict cache: Redis get failed (%s)', e)
+                raw = None
+            if raw is not None:
+                payload = json.loads(raw)
+                self._store_local(key, payload, now)
+                with self._lock:
+                    self.hits += 1
+                return payload
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, payload):
+        if not self.enabled:
+            return
+        self._store_local(key, payload, time.time())
+        if self._redis is not None:
+            try:
+                self._redis.setex(key, int(self.ttl), json.dumps(payload))
+            except Exception as e:
+                logger.warning('Verdict cache: Redis set failed (%s)', e)
+
+    def _store_local(self, key, payload, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'shared_backend': self._redis is not None}
+
+
+def from_env():
+    return VerdictCache(
+        max_entries=int(os.environ.get('VERDICT_CACHE_SIZE', 10000)),
+        ttl=float(os.environ.get('VERDICT_CACHE_TTL', 3600)),
+        redis_url=os.environ.get('VERDICT_CACHE_REDIS_URL'),
+    )
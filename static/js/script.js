@@ -41,8 +41,8 @@ checkBtn.addEventListener('click', async () => {
         return;
     }
     
-    if (text.length > 5000) {
-        alert('Text is too long (max 5000 characters)');
+    if (text.length > 200000) {
+        alert('Text is too long (max 200000 characters)');
         return;
     }
     